@@ -0,0 +1,44 @@
+"""
+Content hashes of files, used by Library CLI to find duplicate ebooks.
+
+Files are memory-mapped instead of read into memory, and the functions only take
+and return plain values so they can run in a process pool. A file that cannot be
+read hashes to None.
+"""
+import hashlib
+import mmap
+
+block = 64 * 1024
+chunk = 1024 * 1024
+
+
+def quick_hash(path):
+    """
+    Returns the hash of the first and last block of a file, which tells most files of the same size apart.
+    Files up to two blocks long are hashed whole, so their quick hash is also their full hash.
+    """
+    try:
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            digest = hashlib.blake2b(digest_size=16)
+            if len(mapped) <= 2 * block:
+                digest.update(mapped)
+            else:
+                digest.update(mapped[:block])
+                digest.update(mapped[-block:])
+            return digest.hexdigest()
+    except (OSError, ValueError):
+        return None
+
+
+def full_hash(path):
+    """
+    Returns the hash of the whole content of a file.
+    """
+    try:
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            digest = hashlib.blake2b(digest_size=16)
+            for start in range(0, len(mapped), chunk):
+                digest.update(mapped[start:start + chunk])
+            return digest.hexdigest()
+    except (OSError, ValueError):
+        return None
@@ -11,10 +11,12 @@ The following application has relatively very few commands but each command has
 The commands are:
 -add
 -del
+-dupes
 -getid
 -open
 -reset
 -search
+-sync
 -update
 
 These commands look or sound similar to SQL commands and that is because they are intentionally designed that way.
@@ -36,11 +38,199 @@ Note: no parameters but "specified value" means that there will be input() follo
 """
 import sqlite3
 import cmd
+import csv
+import json
 import os
-from glob import glob
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from colorama import init, Fore
+from hashing import block, full_hash, quick_hash
+from scanner import scan, selected
 init(autoreset=True)
 
+fields = ["name", "author", "path", "folder", "genre"]
+# Characters messy file names use between words, read as spaces by fuzzy lookups.
+separators = "_.-()[],+"
+
+
+def normalize(name):
+    """
+    Returns the name in lower case with separators turned into single spaces, the same way as sql_normalize().
+    """
+    name = name.lower()
+    for separator in separators:
+        name = name.replace(separator, " ")
+    return name.replace("  ", " ").replace("  ", " ").strip()
+
+
+def sql_normalize(column):
+    """
+    Returns the SQL expression normalizing a column like normalize().
+    """
+    expression = f"lower({column})"
+    for separator in separators:
+        expression = f"replace({expression}, '{separator}', ' ')"
+    return f"trim(replace(replace({expression}, '  ', ' '), '  ', ' '))"
+
+
+def trigrams(text):
+    """
+    Returns the set of 3 character sequences in the text.
+    """
+    return {text[x:x + 3] for x in range(len(text) - 2)}
+
+
+def merge_duplicate_paths(c):
+    """
+    Merges the books added more than once from the same path into the first of them.
+    Its blank fields are filled from the others, and every other value it does not keep is printed.
+    """
+    c.execute("""SELECT rowid, name, author, path, folder, genre FROM ebooks
+                 WHERE path IN (SELECT path FROM ebooks WHERE path <> '' GROUP BY path HAVING COUNT(*) > 1)
+                 ORDER BY path, rowid;""")
+    groups = {}
+    for row in c.fetchall():
+        groups.setdefault(row[3], []).append(row)
+    merged = 0
+    for path, rows in groups.items():
+        kept = dict(zip(["rowid", "name", "author", "path", "folder", "genre"], rows[0]))
+        for row in rows[1:]:
+            for x, field in [(1, "name"), (2, "author"), (4, "folder"), (5, "genre")]:
+                if not kept[field]:
+                    kept[field] = row[x]
+                elif row[x] and row[x] != kept[field]:
+                    print(f"{Fore.RED}ID {row[0]} merged into ID {kept['rowid']}, {field} dropped: {row[x]}")
+        c.execute("UPDATE ebooks SET name=:name, author=:author, folder=:folder, genre=:genre WHERE rowid=:rowid;",
+                  kept)
+        c.executemany("DELETE FROM ebooks WHERE rowid=?;", [(row[0],) for row in rows[1:]])
+        merged += len(rows) - 1
+    if merged:
+        print(f"{Fore.BLUE}Books Added More Than Once, Merged: {Fore.GREEN}{merged}")
+
+
+def absolute_paths(c):
+    """
+    Rewrites the paths stored relative to the working directory, as add dir once did, into absolute paths,
+    the same way open resolves them.
+    """
+    c.execute("SELECT rowid, path FROM ebooks WHERE path <> '';")
+    books = [{"rowid": rowid, "path": os.path.abspath(path)} for rowid, path in c.fetchall() if not os.path.isabs(path)]
+    c.executemany("UPDATE ebooks SET path=:path WHERE rowid=:rowid;", books)
+    if books:
+        print(f"{Fore.BLUE}Relative Paths Made Absolute: {Fore.GREEN}{len(books)}")
+
+
+# The trigram tokenizer of FTS5 needs SQLite 3.34. Older versions keep the trigrams of every name in a plain
+# table instead, filled by the triggers through a table of the positions in a name, as triggers cannot use WITH.
+# The LIMIT keeps SQLite from flattening the normalized name into every position, normalizing it each time.
+fts_trigrams = sqlite3.sqlite_version_info >= (3, 34, 0)
+if fts_trigrams:
+    trigram_migration = [
+        "CREATE VIRTUAL TABLE ebooks_trigram USING fts5(name, content='', tokenize='trigram');",
+        f"""CREATE TRIGGER ebooks_trigram_insert AFTER INSERT ON ebooks BEGIN
+                INSERT INTO ebooks_trigram (rowid, name) VALUES (new.rowid, {sql_normalize('new.name')});
+            END;""",
+        f"""CREATE TRIGGER ebooks_trigram_delete AFTER DELETE ON ebooks BEGIN
+                INSERT INTO ebooks_trigram (ebooks_trigram, rowid, name)
+                VALUES ('delete', old.rowid, {sql_normalize('old.name')});
+            END;""",
+        f"""CREATE TRIGGER ebooks_trigram_update AFTER UPDATE OF name ON ebooks BEGIN
+                INSERT INTO ebooks_trigram (ebooks_trigram, rowid, name)
+                VALUES ('delete', old.rowid, {sql_normalize('old.name')});
+                INSERT INTO ebooks_trigram (rowid, name) VALUES (new.rowid, {sql_normalize('new.name')});
+            END;""",
+        f"INSERT INTO ebooks_trigram (rowid, name) SELECT rowid, {sql_normalize('name')} FROM ebooks;",
+        "CREATE VIRTUAL TABLE ebooks_trigram_vocab USING fts5vocab(ebooks_trigram, 'row');"]
+else:
+    trigram_migration = [
+        """CREATE TABLE ebooks_trigram_postings (
+               trigram TEXT,
+               book INTEGER,
+               PRIMARY KEY (trigram, book)
+        ) WITHOUT ROWID;""",
+        "CREATE TABLE trigram_positions (n INTEGER PRIMARY KEY);",
+        """INSERT INTO trigram_positions WITH RECURSIVE positions (n) AS (SELECT 1 UNION ALL
+               SELECT n + 1 FROM positions WHERE n < 1024) SELECT n FROM positions;""",
+        f"""CREATE TRIGGER ebooks_trigram_insert AFTER INSERT ON ebooks BEGIN
+                INSERT OR IGNORE INTO ebooks_trigram_postings (trigram, book)
+                SELECT substr(normalized, n, 3), new.rowid
+                FROM (SELECT {sql_normalize('new.name')} AS normalized LIMIT 1)
+                JOIN trigram_positions ON n <= length(normalized) - 2;
+            END;""",
+        """CREATE TRIGGER ebooks_trigram_delete AFTER DELETE ON ebooks BEGIN
+               DELETE FROM ebooks_trigram_postings WHERE book = old.rowid;
+           END;""",
+        f"""CREATE TRIGGER ebooks_trigram_update AFTER UPDATE OF name ON ebooks BEGIN
+                DELETE FROM ebooks_trigram_postings WHERE book = old.rowid;
+                INSERT OR IGNORE INTO ebooks_trigram_postings (trigram, book)
+                SELECT substr(normalized, n, 3), new.rowid
+                FROM (SELECT {sql_normalize('new.name')} AS normalized LIMIT 1)
+                JOIN trigram_positions ON n <= length(normalized) - 2;
+            END;""",
+        f"""INSERT OR IGNORE INTO ebooks_trigram_postings (trigram, book)
+            SELECT substr(normalized, n, 3), book FROM (SELECT rowid AS book, {sql_normalize('name')} AS normalized
+                                                        FROM ebooks LIMIT -1)
+            JOIN trigram_positions ON n <= length(normalized) - 2 ORDER BY 1, 2;""",
+        "CREATE INDEX ebooks_trigram_postings_book ON ebooks_trigram_postings (book);"]
+
+
+# Schema migrations, in order. The database remembers in PRAGMA user_version how many it has had.
+# A step is an SQL statement, or a function taking the cursor for a step that has to report what it did.
+migrations = [
+    # 1: merge books added twice from the same path, make paths unique and index the lookup fields
+    [merge_duplicate_paths,
+     "CREATE UNIQUE INDEX ebooks_path ON ebooks (path) WHERE path <> '';",
+     "CREATE INDEX ebooks_name ON ebooks (name);",
+     "CREATE INDEX ebooks_author ON ebooks (author);",
+     "CREATE INDEX ebooks_folder ON ebooks (folder);",
+     "CREATE INDEX ebooks_genre ON ebooks (genre);"],
+    # 2: full-text index of name, author and genre, kept in sync with ebooks by triggers
+    ["""CREATE VIRTUAL TABLE ebooks_fts USING fts5(name, author, genre, content='ebooks', content_rowid='rowid',
+                                                  tokenize='unicode61 remove_diacritics 2');""",
+     """CREATE TRIGGER ebooks_fts_insert AFTER INSERT ON ebooks BEGIN
+            INSERT INTO ebooks_fts (rowid, name, author, genre) VALUES (new.rowid, new.name, new.author, new.genre);
+        END;""",
+     """CREATE TRIGGER ebooks_fts_delete AFTER DELETE ON ebooks BEGIN
+            INSERT INTO ebooks_fts (ebooks_fts, rowid, name, author, genre)
+            VALUES ('delete', old.rowid, old.name, old.author, old.genre);
+        END;""",
+     """CREATE TRIGGER ebooks_fts_update AFTER UPDATE OF name, author, genre ON ebooks BEGIN
+            INSERT INTO ebooks_fts (ebooks_fts, rowid, name, author, genre)
+            VALUES ('delete', old.rowid, old.name, old.author, old.genre);
+            INSERT INTO ebooks_fts (rowid, name, author, genre) VALUES (new.rowid, new.name, new.author, new.genre);
+        END;""",
+     "INSERT INTO ebooks_fts (ebooks_fts) VALUES ('rebuild');"],
+    # 3: trigram index of the normalized names for fuzzy lookups, kept in sync with ebooks by triggers
+    trigram_migration,
+    # 4: size, modification time in ns and inode of each file, and whether it has gone missing, for sync
+    ["ALTER TABLE ebooks ADD COLUMN size INTEGER;",
+     "ALTER TABLE ebooks ADD COLUMN mtime INTEGER;",
+     "ALTER TABLE ebooks ADD COLUMN inode INTEGER;",
+     "ALTER TABLE ebooks ADD COLUMN missing INTEGER NOT NULL DEFAULT 0;"],
+    # 5: content hashes of each file for dupes, with the size:mtime of the file they were taken of
+    ["ALTER TABLE ebooks ADD COLUMN quick_hash TEXT;",
+     "ALTER TABLE ebooks ADD COLUMN full_hash TEXT;",
+     "ALTER TABLE ebooks ADD COLUMN hash_stamp TEXT;"],
+    # 6: make relative paths absolute, as sync compares them, and merge the books that then share a path
+    ["DROP INDEX ebooks_path;",
+     absolute_paths,
+     merge_duplicate_paths,
+     "CREATE UNIQUE INDEX ebooks_path ON ebooks (path) WHERE path <> '';"],
+]
+
+
+def read_records(path):
+    """
+    Yields book records from a CSV file with a header row or a JSON Lines file.
+    Only the name, author, path, folder and genre fields are read, missing ones stay blank.
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        if os.path.splitext(path)[1].lower() in [".jsonl", ".ndjson"]:
+            records = (json.loads(line) for line in file if line.strip())
+        else:
+            records = csv.DictReader(file)
+        for record in records:
+            yield {field: str(record.get(field) or "") for field in fields}
+
 
 # noinspection PyUnusedLocal
 class App(cmd.Cmd):
@@ -48,6 +238,12 @@ class App(cmd.Cmd):
     prompt = ">>>"
     file = None
     db = "./ebooks.db"
+    scan_workers = 8
+    search_limit = 10
+    fuzzy_candidates = 200
+    fuzzy_trigrams = 8
+    fuzzy_postings = 20000
+    hash_processes = None
 
     def __init__(self):
         """
@@ -67,6 +263,27 @@ class App(cmd.Cmd):
             );""")
         except sqlite3.Error:
             pass
+        self.migrate()
+        # which fuzzy index the database has, as it may have been upgraded by another version of SQLite
+        self.fts_trigrams = self.c.execute("SELECT 1 FROM sqlite_master WHERE name = 'ebooks_trigram_vocab';"
+                                           ).fetchone() is not None
+
+    def migrate(self):
+        """
+        Upgrades the database in place by running the migrations it has not had yet.
+        Each migration runs in its own transaction together with the new user_version.
+        """
+        version = self.c.execute("PRAGMA user_version;").fetchone()[0]
+        for number, statements in enumerate(migrations[version:], version + 1):
+            with self.conn:
+                self.c.execute("BEGIN;")
+                for statement in statements:
+                    if callable(statement):
+                        statement(self.c)
+                    else:
+                        self.c.execute(statement)
+                self.c.execute(f"PRAGMA user_version = {number};")
+            print(f"{Fore.GREEN}Database upgraded to version {number}.")
 
     def do_add(self, arg):
         """
@@ -75,13 +292,19 @@ class App(cmd.Cmd):
         Arg:         Param:                 Function:
         dir          <recur/nrecur>         adds all the files in a single directory
         book         none                   adds a book with specified values
+        records      none                   adds the books of a CSV or JSON Lines file of records
 
 
         Name    > Must not be identical to any other name.
-        Path    > Must be absolute path to the file.
+        Path    > Must be absolute path to the file, and not the path of another ebook.
 
         add dir recur                       adds all files in directory and subdirectory
         add dir nrecur                      adds all files in directory only
+
+        Directories also take include and exclude glob patterns separated by spaces, such as *.pdf *.epub.
+        Leave them blank to add every file.
+
+        Records files hold name, author, path, folder and genre fields, with a header row for CSV.
         """
         try:
             array = arg.split()
@@ -94,18 +317,78 @@ class App(cmd.Cmd):
                 self.addbook(name, author, path, folder, genre)
             elif array[0] == "dir":
                 directory = input(f"{Fore.BLUE}Path: ")
+                include = input(f"{Fore.BLUE}Include: ").split()
+                exclude = input(f"{Fore.BLUE}Exclude: ").split()
                 if array[1] == "recur":
-                    self.add_dir_files(directory, True)
+                    self.add_dir_files(directory, True, include, exclude)
                 elif array[1] == "nrecur":
-                    self.add_dir_files(directory, False)
+                    self.add_dir_files(directory, False, include, exclude)
                 else:
                     print(f"{Fore.RED}Input a correct argument.")
+            elif array[0] == "records":
+                path = input(f"{Fore.BLUE}Path: ")
+                count = self.addbooks(read_records(path))
+                print(f"\n{Fore.GREEN}{count} Ebooks Added\n")
             else:
                 return print(f"{Fore.RED}Input a correct argument.")
             print(f"{Fore.GREEN}Operation Successful.")
         except Exception as e:
             print(f"{Fore.RED}{e}")
 
+    def do_sync(self, arg):
+        """
+        Brings the ebooks of a directory in line with the files in it, touching only what changed.
+
+        Arg:         Param:                 Function:
+        recur        [delete]               syncs the directory and its subdirectories
+        nrecur       [delete]               syncs the directory only
+
+
+        New files are added and changed files get their new size and modification time.
+        Moved or renamed files are recognised by their inode and keep their information.
+        Vanished files are marked as missing, or deleted with delete.
+        Directories also take include and exclude glob patterns, like add dir.
+
+        sync recur delete                   syncs all files in directory and subdirectory, deleting vanished ones
+        """
+        try:
+            array = arg.split()
+            if array[0] not in ["recur", "nrecur"] or array[1:] not in [[], ["delete"]]:
+                return print(f"{Fore.RED}Input a correct argument.")
+            directory = input(f"{Fore.BLUE}Path: ")
+            include = input(f"{Fore.BLUE}Include: ").split()
+            exclude = input(f"{Fore.BLUE}Exclude: ").split()
+            counts = self.sync_dir(directory, array[0] == "recur", include, exclude, array[1:] == ["delete"])
+            print("\n")
+            for change, count in counts.items():
+                print(f"{Fore.BLUE}{change.capitalize()}: {Fore.GREEN}{count}")
+            print(f"{Fore.GREEN}Operation Successful.")
+        except Exception as e:
+            print(f"{Fore.RED}{e}")
+
+    def do_dupes(self, arg):
+        """
+        Find ebooks whose files have the same content.
+
+        No arguments.
+
+        Only the ebooks under the specified path are compared, leave it blank to compare all of them.
+        Hashes are kept in the database, so later runs only read new and changed files.
+        """
+        try:
+            path = input(f"{Fore.BLUE}Path: ")
+            groups, wasted = self.find_dupes(path)
+            print("\n")
+            for x, (size, books) in enumerate(groups, 1):
+                print(f"{Fore.BLUE}#{x} {Fore.GREEN}{len(books)} copies of {size} bytes")
+                for rowid, book in books:
+                    print(f"{Fore.BLUE}    ID {rowid}: {Fore.GREEN}{book}")
+            print(f"\n{Fore.BLUE}Duplicate Groups: {Fore.GREEN}{len(groups)}")
+            print(f"{Fore.BLUE}Bytes in Extra Copies: {Fore.GREEN}{wasted}")
+            print(f"{Fore.GREEN}Operation Successful.")
+        except Exception as e:
+            print(f"{Fore.RED}{e}")
+
     def do_getid(self, arg):
         """
         Retrieve the ID of a book by using its name.
@@ -202,10 +485,29 @@ class App(cmd.Cmd):
         folder       none                   searches all ebooks with specified folder
         author       none                   searches all ebooks with specified author
         genre        none                   searches all ebooks with specified genre
+        missing      none                   searches all ebooks whose file has vanished, see sync
+        text         [count]                searches the words in name, author and genre, best matches first
+        fuzzy        [count]                searches the names most similar to the specified name, despite typos
+
+
+        Text searches show the first 10 results unless a count is given, with the matched words highlighted.
+        Words are all matched, so add OR between them to match any:
+
+        crime punish*                       words starting with punish
+        "crime and punishment"              the exact phrase
+        author: dostoevsky                  the word in that field only
         """
         try:
             array = arg.split()
-            if array[0] == "id":
+            if array[0] == "text":
+                query = input(f"{Fore.BLUE}Text: ")
+                limit = int(array[1]) if len(array) > 1 else self.search_limit
+                self.display_matches(self.search_text(query, limit))
+            elif array[0] == "fuzzy":
+                name = input(f"{Fore.BLUE}Name: ")
+                limit = int(array[1]) if len(array) > 1 else self.search_limit
+                self.display_similar(self.search_fuzzy(name, limit))
+            elif array[0] == "id":
                 with self.conn:
                     self.c.execute("SELECT * FROM ebooks WHERE rowid=:id", {"id": int(array[1])})
                     book_list = self.c.fetchall()
@@ -216,6 +518,11 @@ class App(cmd.Cmd):
                     self.c.execute("SELECT * FROM ebooks WHERE name=:name", {"name": name})
                     book_list = self.c.fetchall()
                     self.display(book_list)
+            elif array[0] == "missing":
+                with self.conn:
+                    self.c.execute("SELECT * FROM ebooks WHERE missing=1")
+                    book_list = self.c.fetchall()
+                    self.display(book_list)
             elif array[0] == "folder":
                 folder = input(f"{Fore.BLUE}Folder: ")
                 with self.conn:
@@ -330,34 +637,284 @@ class App(cmd.Cmd):
                                                                                     "genre": genre})
         print(f"{Fore.GREEN}Ebook added successfully.")
 
-    def add_dir_files(self, path, rec):
+    def addbooks(self, records, batch=1000):
+        """
+        Adds books to the table from an iterable of records, dictionaries of the 5 fields.
+        Records are inserted in batches with executemany, all in one transaction, and a
+        counter is printed instead of a line per book.
+        Books whose path is already in the table are skipped.
+        Returns the number of books added.
+        """
+        query = """INSERT OR IGNORE INTO ebooks (name, path, folder, author, genre, size, mtime, inode)
+                   VALUES (:name, :path, :folder, :author, :genre, :size, :mtime, :inode);"""
+        count = 0
+        books = []
+        with self.conn:
+            for record in records:
+                books.append({"size": None, "mtime": None, "inode": None, **record})
+                if len(books) >= batch:
+                    self.c.executemany(query, books)
+                    count += self.c.rowcount
+                    books = []
+                    print(f"\r{Fore.BLUE}Ebooks Added: {Fore.GREEN}{count}", end="")
+            if books:
+                self.c.executemany(query, books)
+                count += self.c.rowcount
+        return count
+
+    def add_dir_files(self, path, rec, include=None, exclude=None):
         """
         Adds to the table all the files that are in a directory.
         Path of directory must be specified.
         Will add the ebook name and path only to the table.
         All other fields remain blank.
+        Files are streamed from the scanner, which lists subdirectories in parallel.
+        Paths are stored absolute, as sync compares them.
         """
-        names = []
-        if rec:
-            files = glob(path + '/**/*.*', recursive=rec)
-        else:
-            files = glob(path + '/*.*', recursive=rec)
+        files = scan(os.path.abspath(path), rec, include, exclude, self.scan_workers, stat=True)
+        records = (self.file_record(entry) for entry in files)
+        count = self.addbooks(records)
+        print(f"\n{Fore.GREEN}{count} Ebooks Added\n")
+
+    @staticmethod
+    def file_record(entry):
+        """
+        Returns the record of a file found by the scanner, with its size, modification time and inode.
+        On Windows the scanner's stat has no inode, so the file is stat'ed again for its file index.
+        """
+        stat = entry.stat()
+        if not stat.st_ino:
+            stat = os.stat(entry.path)
+        return {"name": os.path.splitext(entry.name)[0], "author": "", "path": entry.path, "folder": "", "genre": "",
+                "size": stat.st_size, "mtime": stat.st_mtime_ns, "inode": stat.st_ino}
+
+    def sync_dir(self, path, rec, include=None, exclude=None, delete=False, batch=5000):
+        """
+        Compares a scan of a directory with the ebooks under it and applies only the differences,
+        in a transaction per batch of changes.
+        Files whose path is unknown but whose inode, size and modification time belong to a vanished
+        ebook are taken as moved, and the ebook gets the new path.
+        Ebooks the include and exclude patterns leave out are not touched.
+        Returns the number of new, changed, moved, vanished and unchanged files.
+        """
+        directory = os.path.abspath(path)
+        prefix = os.path.join(directory, "")
+        self.c.execute("""SELECT rowid, path, size, mtime, inode, missing FROM ebooks
+                          WHERE path <> '' AND path >= :start AND path < :end;""",
+                       {"start": prefix, "end": prefix[:-1] + chr(ord(prefix[-1]) + 1)})
+        known = {row[1]: row for row in self.c.fetchall()
+                 if (rec or os.path.dirname(row[1]) == directory) and selected(row[1], directory, include, exclude)}
+        by_stat = {(row[4], row[2], row[3]): row[1] for row in known.values() if row[4] is not None}
+        counts = dict.fromkeys(["new", "changed", "moved", "vanished", "unchanged"], 0)
+        inserts = []
+        updates = []
+        held = []
+        scanned = 0
+
+        def apply():
+            with self.conn:
+                self.addbooks(inserts)
+                self.c.executemany("""UPDATE ebooks SET size=:size, mtime=:mtime, inode=:inode, missing=0
+                                      WHERE rowid=:rowid;""", updates)
+            inserts.clear()
+            updates.clear()
+
+        for entry in scan(directory, rec, include, exclude, self.scan_workers, stat=True):
+            record = self.file_record(entry)
+            row = known.pop(record["path"], None)
+            if row is None and (record["inode"], record["size"], record["mtime"]) in by_stat:
+                held.append(record)
+            elif row is None:
+                inserts.append(record)
+                counts["new"] += 1
+            elif row[2:] != (record["size"], record["mtime"], record["inode"], 0):
+                updates.append({**record, "rowid": row[0]})
+                counts["changed"] += 1
+            else:
+                counts["unchanged"] += 1
+            scanned += 1
+            if len(inserts) + len(updates) >= batch:
+                apply()
+                print(f"\r{Fore.BLUE}Files Scanned: {Fore.GREEN}{scanned}", end="")
+
+        moves = []
+        for record in held:
+            old_path = by_stat[(record["inode"], record["size"], record["mtime"])]
+            row = known.pop(old_path, None)
+            if row is None:
+                inserts.append(record)
+                counts["new"] += 1
+            else:
+                moves.append({**record, "rowid": row[0], "old_name": os.path.splitext(os.path.basename(old_path))[0]})
+                counts["moved"] += 1
+        vanished = [{"rowid": row[0]} for row in known.values() if delete or not row[5]]
+        counts["vanished"] = len(vanished)
+        apply()
+        with self.conn:
+            self.c.executemany("""UPDATE ebooks SET path=:path, name=CASE WHEN name=:old_name THEN :name ELSE name END,
+                                  missing=0 WHERE rowid=:rowid;""", moves)
+            if delete:
+                self.c.executemany("DELETE FROM ebooks WHERE rowid=:rowid;", vanished)
+            else:
+                self.c.executemany("UPDATE ebooks SET missing=1 WHERE rowid=:rowid;", vanished)
+        return counts
+
+    def find_dupes(self, path=""):
+        """
+        Returns the groups of ebooks with the same content, as (size, [(rowid, path)]) pairs, and the bytes
+        the extra copies take.
+        Files are compared in stages, each only among the files still alike: by size, then by a quick hash of
+        their first and last blocks, then by a full hash. Hashing runs in a process pool. Hashes are stored
+        with the size and modification time of the file, and reused while those stay the same.
+        """
+        prefix = os.path.join(os.path.abspath(path), "") if path else ""
+        self.c.execute("""SELECT rowid, path, quick_hash, full_hash, hash_stamp FROM ebooks
+                          WHERE path <> '' AND missing = 0 AND path >= :start AND path < :end;""",
+                       {"start": prefix, "end": prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else chr(0x10ffff)})
+        rows = self.c.fetchall()
+
+        def stat(row):
+            try:
+                result = os.stat(row[1])
+            except OSError:
+                return None
+            return row, result.st_size, f"{result.st_size}:{result.st_mtime_ns}"
+
+        with ThreadPoolExecutor(self.scan_workers) as pool:
+            files = [file for file in pool.map(stat, rows) if file is not None]
+        by_size = {}
         for file in files:
-            file = os.path.basename(file)
-            name = os.path.splitext(file)[0]
-            names.append(name)
+            if file[1] > 0:
+                by_size.setdefault(file[1], []).append(file)
+        candidates = [file for group in by_size.values() if len(group) > 1 for file in group]
+
+        hashes = {}
+        for row, size, stamp in candidates:
+            valid = stamp == row[4]
+            hashes[row[0]] = {"rowid": row[0], "stamp": stamp, "quick": row[2] if valid else None,
+                              "full": row[3] if valid else None}
+        changed = set()
+        processes = None
+        try:
+            stale = [(row, size) for row, size, stamp in candidates if hashes[row[0]]["quick"] is None]
+            if stale:
+                processes = ProcessPoolExecutor(self.hash_processes)
+                for (row, size), digest in zip(stale, processes.map(quick_hash, [row[1] for row, size in stale],
+                                                                    chunksize=32)):
+                    hashes[row[0]]["quick"] = digest
+                    changed.add(row[0])
+            by_quick = {}
+            for row, size, stamp in candidates:
+                if hashes[row[0]]["quick"] is not None:
+                    by_quick.setdefault((size, hashes[row[0]]["quick"]), []).append((row, size))
+            stale = []
+            for group in by_quick.values():
+                for row, size in group if len(group) > 1 else []:
+                    if size <= 2 * block:
+                        hashes[row[0]]["full"] = hashes[row[0]]["quick"]
+                    elif hashes[row[0]]["full"] is None:
+                        stale.append((row, size))
+            if stale:
+                processes = processes or ProcessPoolExecutor(self.hash_processes)
+                for (row, size), digest in zip(stale, processes.map(full_hash, [row[1] for row, size in stale],
+                                                                    chunksize=4)):
+                    hashes[row[0]]["full"] = digest
+                    changed.add(row[0])
+        finally:
+            if processes is not None:
+                processes.shutdown()
         with self.conn:
-            for name, path in zip(names, files):
-                self.addbook(name, "", path, "", "")
-        print(f"\n{Fore.GREEN}{len(files)} Ebooks Added\n")
+            self.c.executemany("""UPDATE ebooks SET quick_hash=:quick, full_hash=:full, hash_stamp=:stamp
+                                  WHERE rowid=:rowid;""", [hashes[rowid] for rowid in changed])
+
+        by_full = {}
+        for row, size, stamp in candidates:
+            if hashes[row[0]]["full"] is not None:
+                by_full.setdefault((size, hashes[row[0]]["full"]), []).append((row[0], row[1]))
+        groups = sorted(((size, sorted(books)) for (size, digest), books in by_full.items() if len(books) > 1),
+                        key=lambda group: group[0] * (len(group[1]) - 1), reverse=True)
+        return groups, sum(size * (len(books) - 1) for size, books in groups)
+
+    def search_text(self, query, limit):
+        """
+        Returns the rowid, name, author and genre of the best full-text matches of the query,
+        ranked with bm25 where the name weighs most, with the matched words highlighted.
+        Queries that are not valid FTS5 syntax are searched as plain words.
+        """
+        sql = """SELECT rowid, highlight(ebooks_fts, 0, :start, :end), highlight(ebooks_fts, 1, :start, :end),
+                        highlight(ebooks_fts, 2, :start, :end)
+                 FROM ebooks_fts WHERE ebooks_fts MATCH :query
+                 ORDER BY bm25(ebooks_fts, 10.0, 5.0, 1.0) LIMIT :limit;"""
+        values = {"start": Fore.RED, "end": Fore.GREEN, "query": query, "limit": limit}
+        try:
+            return self.c.execute(sql, values).fetchall()
+        except sqlite3.OperationalError:
+            words = ['"' + word.rstrip("*").replace('"', '""') + '"' + ("*" if word.endswith("*") else "")
+                     for word in query.split()]
+            values["query"] = " ".join(words)
+            return self.c.execute(sql, values).fetchall()
+
+    def search_fuzzy(self, name, limit):
+        """
+        Returns the rowid, name and similarity of the ebooks whose names are most similar to the name.
+        Candidates holding the rarest trigrams of the name found in the index are looked up through it,
+        then ranked by the share of the trigrams of the name they contain.
+        Trigrams found nowhere, such as those of a typo, are left out of the lookup, and common ones are
+        only used while the ebooks holding them stay within fuzzy_postings, which bounds the time taken.
+        Without FTS5 trigrams the index is the ebooks_trigram_postings table, see trigram_migration.
+        """
+        wanted = trigrams(normalize(name))
+        if not wanted:
+            return []
+        placeholders = ", ".join("?" * len(wanted))
+        if self.fts_trigrams:
+            self.c.execute(f"""SELECT term, doc FROM ebooks_trigram_vocab WHERE term IN ({placeholders})
+                               ORDER BY doc LIMIT ?;""", [*wanted, self.fuzzy_trigrams])
+        else:
+            self.c.execute(f"""SELECT trigram, COUNT(*) FROM ebooks_trigram_postings WHERE trigram IN ({placeholders})
+                               GROUP BY trigram ORDER BY COUNT(*) LIMIT ?;""", [*wanted, self.fuzzy_trigrams])
+        rarest = []
+        postings = 0
+        for term, count in self.c.fetchall():
+            postings += count
+            if rarest and postings > self.fuzzy_postings:
+                break
+            rarest.append(term)
+        if not rarest:
+            return []
+        if self.fts_trigrams:
+            query = " OR ".join('"' + trigram.replace('"', '""') + '"' for trigram in rarest)
+            self.c.execute("""SELECT ebooks.rowid, ebooks.name FROM ebooks_trigram
+                              JOIN ebooks ON ebooks.rowid = ebooks_trigram.rowid
+                              WHERE ebooks_trigram MATCH :query ORDER BY rank LIMIT :limit;""",
+                           {"query": query, "limit": self.fuzzy_candidates})
+        else:
+            self.c.execute(f"""SELECT ebooks.rowid, ebooks.name FROM (
+                                   SELECT book, COUNT(*) AS shared FROM ebooks_trigram_postings
+                                   WHERE trigram IN ({", ".join("?" * len(rarest))})
+                                   GROUP BY book ORDER BY shared DESC LIMIT ?)
+                               JOIN ebooks ON ebooks.rowid = book;""", [*rarest, self.fuzzy_candidates])
+        matches = []
+        for rowid, candidate in self.c.fetchall():
+            found = trigrams(normalize(candidate))
+            shared = len(wanted & found)
+            matches.append((shared / len(wanted), shared / len(wanted | found), rowid, candidate))
+        matches.sort(reverse=True)
+        return [(rowid, candidate, similarity) for similarity, _, rowid, candidate in matches[:limit]]
 
     def getid(self, name):
         """
         Prints out the rowid of an ebook, and uses ebook's name as an argument.
+        Prints out the most similar names instead if no ebook has that name.
         """
         with self.conn:
             self.c.execute("SELECT rowid FROM ebooks WHERE name = :name;", {"name": name})
-            print(f"{Fore.BLUE}RowID of {name}: {Fore.GREEN}{self.c.fetchone()[0]}")
+            book = self.c.fetchone()
+        if book is not None:
+            print(f"{Fore.BLUE}RowID of {name}: {Fore.GREEN}{book[0]}")
+        else:
+            print(f"{Fore.RED}No ebook is named {name}. Most similar names:")
+            self.display_similar(self.search_fuzzy(name, 5))
 
     def info(self, book_id):
         """
@@ -387,6 +944,28 @@ class App(cmd.Cmd):
             x += 1
         print("\n")
 
+    @staticmethod
+    def display_matches(array):
+        """
+        Prints out the id, name, author and genre of the ebooks passed in the array argument.
+        """
+        print("\n")
+        for x, (rowid, name, author, genre) in enumerate(array, 1):
+            print(f"{Fore.GREEN}#{x} {Fore.BLUE}ID {rowid}: {Fore.GREEN}{name}"
+                  + (f" {Fore.BLUE}by {Fore.GREEN}{author}" if author else "")
+                  + (f" {Fore.BLUE}in {Fore.GREEN}{genre}" if genre else ""))
+        print("\n")
+
+    @staticmethod
+    def display_similar(array):
+        """
+        Prints out the id, name and similarity of the ebooks passed in the array argument.
+        """
+        print("\n")
+        for x, (rowid, name, similarity) in enumerate(array, 1):
+            print(f"{Fore.GREEN}#{x} {Fore.BLUE}ID {rowid}: {Fore.GREEN}{name} {Fore.BLUE}({similarity:.0%})")
+        print("\n")
+
     @staticmethod
     def do_clear(arg):
         """
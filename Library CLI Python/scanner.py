@@ -0,0 +1,84 @@
+"""
+Scanner of the files in a directory tree, used by Library CLI to import ebooks.
+
+Directories are listed with os.scandir on a thread pool, so on network shares where
+every listing and stat is a round-trip many of them are waited on at once. Files are
+yielded as soon as their directory is listed, without building the whole list.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from fnmatch import fnmatch
+
+
+def matches(entry, patterns):
+    """
+    Returns True if the name or path of the entry matches any of the glob patterns.
+    """
+    return any(fnmatch(entry.name, pattern) or fnmatch(entry.path, pattern) for pattern in patterns)
+
+
+def selected(path, root, include=None, exclude=None):
+    """
+    Returns True if scanning root would yield the file at path, given the same patterns.
+    """
+    include = include or []
+    exclude = exclude or []
+    current = root
+    for name in os.path.relpath(path, root).split(os.sep):
+        current = os.path.join(current, name)
+        if any(fnmatch(name, pattern) or fnmatch(current, pattern) for pattern in exclude):
+            return False
+    name = os.path.basename(path)
+    return not include or any(fnmatch(name, pattern) or fnmatch(path, pattern) for pattern in include)
+
+
+def scan(root, recursive=True, include=None, exclude=None, workers=8, stat=False):
+    """
+    Yields an os.DirEntry for every file in root, in no particular order.
+
+    include     glob patterns a file must match, such as *.pdf, none includes every file
+    exclude     glob patterns of files and directories to skip, such as .git
+    stat        stats every file in the pool, so entry.stat() does not touch the disk again
+
+    Directories that cannot be read are skipped. Symbolic links are not followed into.
+    """
+    include = include or []
+    exclude = exclude or []
+
+    def list_dir(path):
+        files = []
+        directories = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if matches(entry, exclude):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    elif entry.is_file() and (not include or matches(entry, include)):
+                        if stat:
+                            entry.stat()
+                        files.append(entry)
+                except OSError:
+                    continue
+        return files, directories
+
+    pool = ThreadPoolExecutor(workers)
+    try:
+        pending = {pool.submit(list_dir, root)}
+        first = True
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    files, directories = future.result()
+                except OSError:
+                    if first:
+                        raise
+                    continue
+                first = False
+                if recursive:
+                    pending.update(pool.submit(list_dir, directory) for directory in directories)
+                yield from files
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
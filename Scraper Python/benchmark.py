@@ -0,0 +1,169 @@
+"""
+Benchmark of the Scraper pipeline against synthetic webpages served from a
+local HTTP server.
+
+Every parser is run over fixtures of several page sizes and DOM depths. For each
+run the pages/sec, parse ms/page, rows/sec and peak RSS are reported and written
+as JSON so results can be compared between changes:
+
+    python benchmark.py -o bench.json
+    python benchmark.py --pages 50 --parsers lxml html.parser
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ModuleNotFoundError:
+    resource = None
+
+selectors = [('h3', 'title'), ('p', 'price')]
+rowSizes = [20, 200, 2000]
+depths = [2, 12]
+
+
+def fixture(rows, depth, page):
+    """Return the markup of one synthetic listing webpage."""
+    opening = '<div class="wrapper">' * depth
+    closing = '</div>' * depth
+    items = ''.join(f'<li class="item">{opening}<h3 class="title">Item {page}-{x}</h3>'
+                    f'<p class="price">{x * 3 + page}.99</p><span class="note">In stock</span>{closing}</li>'
+                    for x in range(rows))
+    return (f'<!DOCTYPE html><html><head><title>Page {page}</title></head><body>'
+            f'<nav><a href="/">Home</a><a class="next" href="?page={page + 1}">Next</a></nav>'
+            f'<ul class="listing">{items}</ul><footer>Page {page}</footer></body></html>').encode()
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Serves /<rows>/<depth>/<page> as a fixture webpage."""
+
+    def do_GET(self):
+        try:
+            rows, depth, page = (int(part) for part in self.path.strip('/').split('/'))
+        except ValueError:
+            self.send_error(404)
+            return
+        body = fixture(rows, depth, page)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB, or None where it is unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_case(base, parser, rows, depth, pages, workers, processes=0):
+    """Scrape one fixture with one parser and return its measurements. Runs in its own process."""
+    from extract import extract_rows
+    from fetchers import HttpFetcher
+    from main import Scraper
+
+    scraper = Scraper()
+    scraper.fetcher = 'http'
+    scraper.parser = parser
+    scraper.workers = workers
+    scraper.processes = processes
+    scraper.quiet = True
+    scraper.initial_webpage = f"{base}/{rows}/{depth}/1"
+    scraper.rpages = f"{base}/{rows}/{depth}/$"
+    scraper.variable = pages
+    webpages = scraper.webpages()
+
+    with HttpFetcher() as fetcher:
+        bodies = [fetcher.fetch(webpage) for webpage in webpages]
+    parse_times = []
+    for body in bodies:
+        start = time.perf_counter()
+        extract_rows(body, parser, selectors)
+        parse_times.append((time.perf_counter() - start) * 1000)
+
+    with tempfile.TemporaryDirectory() as directory:
+        scraper.csv_file = os.path.join(directory, 'bench.csv')
+        scraper.csv_mode = 'w'
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            scraper.scrape(webpages, selectors)
+            elapsed = time.perf_counter() - start
+
+    return {
+        "parser": parser,
+        "rows_per_page": rows,
+        "depth": depth,
+        "page_bytes": len(bodies[0]),
+        "pages": len(webpages),
+        "workers": workers,
+        "processes": processes,
+        "pages_per_sec": round(len(webpages) / elapsed, 2),
+        "parse_ms_per_page": round(statistics.mean(parse_times), 3),
+        "parse_ms_p95": round(sorted(parse_times)[int(len(parse_times) * 0.95)], 3),
+        "rows_per_sec": round(len(webpages) * rows / elapsed, 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description='Benchmark the Scraper pipeline against local fixtures.')
+    argparser.add_argument('-o', '--output', default='bench_results.json', help='JSON file results are written to.')
+    argparser.add_argument('--pages', type=int, default=20, help='Webpages scraped per fixture.')
+    argparser.add_argument('--workers', type=int, default=4, help='Webpages fetched at the same time.')
+    argparser.add_argument('--processes', type=int, default=0, help='Worker processes parsing webpages.')
+    argparser.add_argument('--parsers', nargs='+', default=['lxml', 'html5lib', 'html.parser'])
+    argparser.add_argument('--rows', nargs='+', type=int, default=rowSizes, help='Rows per fixture webpage.')
+    argparser.add_argument('--depths', nargs='+', type=int, default=depths, help='DOM depth of every row.')
+    opts = argparser.parse_args(argv)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    results = []
+    try:
+        for parser in opts.parsers:
+            for rows in opts.rows:
+                for depth in opts.depths:
+                    # A fresh process per case keeps the peak RSS of each parser apart. Unlike
+                    # multiprocessing.Pool workers it may start its own parsing processes.
+                    with ProcessPoolExecutor(1) as pool:
+                        result = pool.submit(run_case, base, parser, rows, depth, opts.pages, opts.workers,
+                                             opts.processes).result()
+                    results.append(result)
+                    print(f"{parser:<12} rows={rows:<5} depth={depth:<3} "
+                          f"{result['pages_per_sec']:>8} pages/s {result['parse_ms_per_page']:>9} ms/parse "
+                          f"{result['rows_per_sec']:>10} rows/s {result['peak_rss_mb']} MB")
+    finally:
+        server.shutdown()
+
+    report = {
+        "date": datetime.datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(opts.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to {opts.output}")
+
+
+if __name__ == '__main__':
+    main()
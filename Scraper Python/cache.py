@@ -0,0 +1,75 @@
+"""
+Module contains the on-disk response cache used by the HTTP fetcher so that
+webpages already downloaded are revalidated or replayed instead of fetched again.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    Stores response bodies with their ETag and Last-Modified headers, keyed by url.
+
+    The cache lives in a SQLite file inside directory. Once the stored bodies grow past
+    max_bytes the least recently used webpages are evicted.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(directory, 'cache.db'), check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+                                 url TEXT PRIMARY KEY,
+                                 etag TEXT,
+                                 last_modified TEXT,
+                                 body BLOB,
+                                 size INTEGER,
+                                 accessed REAL
+            );""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);")
+        self.total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses;").fetchone()[0]
+
+    def get(self, url):
+        """Return (body, etag, last_modified) for url, or None if it is not cached."""
+        with self._lock:
+            entry = self.conn.execute("SELECT body, etag, last_modified FROM responses WHERE url=:url",
+                                      {"url": url}).fetchone()
+            if entry is not None:
+                self._touch(url)
+        return entry
+
+    def _touch(self, url):
+        with self.conn:
+            self.conn.execute("UPDATE responses SET accessed=:now WHERE url=:url", {"now": time.time(), "url": url})
+
+    def put(self, url, body, etag=None, last_modified=None):
+        """Store the response of url and evict old webpages if the cache is over its size."""
+        with self._lock, self.conn:
+            old = self.conn.execute("SELECT size FROM responses WHERE url=:url", {"url": url}).fetchone()
+            self.conn.execute("""INSERT OR REPLACE INTO responses (url, etag, last_modified, body, size, accessed)
+                                 VALUES (:url, :etag, :last_modified, :body, :size, :now);""",
+                              {"url": url, "etag": etag, "last_modified": last_modified, "body": body,
+                               "size": len(body), "now": time.time()})
+            self.total += len(body) - (old[0] if old else 0)
+            self._evict()
+
+    def _evict(self):
+        while self.total > self.max_bytes:
+            oldest = self.conn.execute("SELECT url, size FROM responses ORDER BY accessed LIMIT 1;").fetchone()
+            if oldest is None:
+                break
+            self.conn.execute("DELETE FROM responses WHERE url=:url", {"url": oldest[0]})
+            self.total -= oldest[1]
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM responses;")
+            self.total = 0
+
+    def close(self):
+        self.conn.close()
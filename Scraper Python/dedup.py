@@ -0,0 +1,137 @@
+"""
+Module contains the membership filters the Scraper drops duplicate rows with,
+across the webpages of a scrape and across scrapes of the same output.
+"""
+import array
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+
+
+def row_key(row, keys=()):
+    """Return the bytes a row is told apart by: the cells of the key columns, or every cell without them."""
+    return json.dumps([row[x] for x in keys] if keys else list(row)).encode('utf-8')
+
+
+class ExactFilter:
+    """
+    Set of the 64-bit hashes of every row key seen, kept in <output>.seen.
+
+    New keys are pending until commit() appends them to the file, so the file only holds
+    rows the journal has recorded. Memory grows with the number of rows.
+    """
+
+    suffix = '.seen'
+
+    def __init__(self, path, capacity=0):
+        self.path = path + self.suffix
+        self.seen = set()
+        self.pending = []
+        if os.path.exists(self.path):
+            stored = array.array('q')
+            with open(self.path, 'rb') as file:
+                stored.frombytes(file.read())
+            self.seen.update(stored)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add(self, key):
+        """Add a row key and return whether it was new."""
+        value = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big', signed=True)
+        if value in self.seen:
+            return False
+        self.seen.add(value)
+        self.pending.append(value)
+        return True
+
+    def commit(self):
+        with open(self.path, 'ab') as file:
+            file.write(array.array('q', self.pending).tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        self.pending = []
+
+    def close(self):
+        pass
+
+
+class BloomFilter:
+    """
+    Bloom filter of every row key seen, kept in <output>.bloom and memory-mapped.
+
+    It is sized for capacity keys at a false positive rate of error, so memory stays the
+    same however many rows are scraped; past capacity more new rows are wrongly taken as
+    duplicates. New keys are held apart until commit() sets their bits, so the file only
+    holds rows the journal has recorded.
+    """
+
+    suffix = '.bloom'
+    header = struct.Struct('<8sQQ')
+    magic = b'SCRBLOOM'
+
+    def __init__(self, path, capacity=10000000, error=0.001):
+        self.path = path + self.suffix
+        if not os.path.exists(self.path):
+            bits = max(64, math.ceil(-capacity * math.log(error) / math.log(2) ** 2))
+            hashes = max(1, round(bits / capacity * math.log(2)))
+            with open(self.path, 'wb') as file:
+                file.write(self.header.pack(self.magic, bits, hashes))
+                file.truncate(self.header.size + (bits + 7) // 8)
+        self.file = open(self.path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, self.bits, self.hashes = self.header.unpack_from(self.map)
+        if magic != self.magic:
+            self.close()
+            raise ValueError(f"{self.path} is not a Bloom filter.")
+        self.pending = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + x * second) % self.bits for x in range(self.hashes)]
+
+    def add(self, key):
+        """Add a row key and return whether it was new, which is wrong at the error rate."""
+        positions = tuple(self._positions(key))
+        if positions in self.pending:
+            return False
+        offset = self.header.size
+        if all(self.map[offset + position // 8] >> (position % 8) & 1 for position in positions):
+            return False
+        self.pending.add(positions)
+        return True
+
+    def commit(self):
+        offset = self.header.size
+        for positions in self.pending:
+            for position in positions:
+                self.map[offset + position // 8] |= 1 << (position % 8)
+        self.map.flush()
+        self.pending = set()
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+filterTypes = {'exact': ExactFilter, 'bloom': BloomFilter}
+
+
+def clear_filters(path):
+    """Delete the filters kept for the output at path, forgetting every row written to it."""
+    for kind in filterTypes.values():
+        if os.path.exists(path + kind.suffix):
+            os.remove(path + kind.suffix)
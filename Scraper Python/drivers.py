@@ -0,0 +1,100 @@
+"""
+Module contains the browser session pool used by the Scraper so that
+Chrome is launched once per job instead of once per webpage.
+"""
+import queue
+import threading
+
+from selenium import webdriver
+
+
+class DriverPool:
+    """
+    Keeps a fixed number of long-lived Chrome sessions.
+
+    A session is handed out with acquire() and given back with release(). Sessions are
+    recycled after a number of pages or as soon as a page fails to load, and every session
+    still running, idle or handed out, is shut down by close().
+    """
+
+    def __init__(self, size=1, headless=False, recycle=100):
+        self.size = max(1, int(size))
+        self.headless = headless
+        self.recycle = int(recycle)
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle = queue.LifoQueue()
+        self._uses = {}
+        self._busy = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _launch(self):
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument('--headless=new')
+            options.add_argument('--disable-gpu')
+        driver = webdriver.Chrome(options=options)
+        self._uses[id(driver)] = 0
+        self._busy[id(driver)] = driver
+        return driver
+
+    def _discard(self, driver):
+        self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Return an idle session, starting a new one if none is idle, and block while all are busy."""
+        self._slots.acquire()
+        try:
+            driver = self._idle.get_nowait()
+            self._busy[id(driver)] = driver
+            return driver
+        except queue.Empty:
+            pass
+        try:
+            return self._launch()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, driver, failed=False):
+        """Give a session back, quitting it if it crashed or has served enough pages."""
+        self._busy.pop(id(driver), None)
+        self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+        if failed or (self.recycle and self._uses[id(driver)] >= self.recycle):
+            self._discard(driver)
+        else:
+            self._idle.put(driver)
+        self._slots.release()
+
+    def fetch(self, url):
+        """Load url in a pooled session and return the rendered HTML."""
+        driver = self.acquire()
+        failed = True
+        try:
+            driver.get(url)
+            source = driver.page_source
+            failed = False
+        finally:
+            # a dead chromedriver raises connection errors, not only WebDriverException
+            self.release(driver, failed=failed)
+        return source
+
+    def close(self):
+        """Quit every session still held by the pool, including those handed out."""
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+        for driver in list(self._busy.values()):
+            self._busy.pop(id(driver), None)
+            self._discard(driver)
@@ -0,0 +1,105 @@
+"""
+Module contains the parsing and extraction step of the Scraper, turning the
+markup of a webpage into the rows that are written to the CSV file.
+"""
+import re
+import time
+from urllib.parse import urldefrag, urljoin
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+
+def class_matches(tag, element_class):
+    """Match a tag against a class the same way find_all(class_=...) does. '#' matches any class."""
+    if element_class == '#':
+        return True
+    classes = tag.get('class') or []
+    return element_class in classes or ' '.join(classes) == element_class
+
+
+def parse(markup, parser, selectors, targeted=True):
+    """
+    Build the soup of a webpage.
+
+    In targeted mode only the tags named in selectors, and what they contain, are built
+    into the tree. html5lib cannot do this and always builds the full tree.
+    """
+    if targeted and parser != 'html5lib':
+        strainer = SoupStrainer({element for (element, element_class) in selectors})
+        return BeautifulSoup(markup, parser, parse_only=strainer)
+    return BeautifulSoup(markup, parser)
+
+
+def extract(page_soup, selectors):
+    """
+    Return (rows, elements) of a parsed webpage, rows being tuples of stripped text.
+
+    selectors is a list of (element, class) pairs, one per column. All columns are
+    collected in a single traversal of the soup, and the first column decides how many
+    rows there are; shorter columns are padded with empty cells. elements is the number
+    of tags that matched a selector.
+    """
+    if not selectors:
+        return [], 0
+    names = {element for (element, element_class) in selectors}
+    columns = [[] for _ in selectors]
+    for tag in page_soup.find_all(names):
+        for index, (element, element_class) in enumerate(selectors):
+            if tag.name == element and class_matches(tag, element_class):
+                columns[index].append(tag.get_text().strip())
+    rows = []
+    for x in range(len(columns[0])):
+        rows.append(tuple(column[x] if x < len(column) else '' for column in columns))
+    return rows, sum(len(column) for column in columns)
+
+
+def extract_rows(markup, parser, selectors, targeted=True):
+    """Parse the markup of a webpage and return its rows."""
+    if not selectors:
+        return []
+    return extract(parse(markup, parser, selectors, targeted), selectors)[0]
+
+
+def find_links(page_soup, page, link=None, pattern=None):
+    """
+    Return the absolute urls a parsed webpage links to, without fragments.
+
+    link is an (element, class) pair naming the next-page links; an element without an
+    href of its own uses the first link inside it. Without link every <a> is used.
+    pattern is a regular expression the urls must match.
+    """
+    if link:
+        tags = [tag for tag in page_soup.find_all(link[0]) if class_matches(tag, link[1])]
+    else:
+        tags = page_soup.find_all('a')
+    urls = []
+    for tag in tags:
+        href = tag.get('href')
+        if not href:
+            inner = tag.find('a', href=True)
+            href = inner.get('href') if inner else None
+        if not href:
+            continue
+        url = urldefrag(urljoin(page, href))[0]
+        if url.startswith(('http://', 'https://')) and (not pattern or re.search(pattern, url)):
+            urls.append(url)
+    return urls
+
+
+def process_page(markup, page, parser, selectors, targeted=True, crawl=None, skip_rows=False):
+    """
+    Parse one webpage and return (rows, elements, links, parse_ms, extract_ms).
+
+    This is the whole CPU-bound part of a scrape, so it takes and returns only plain data
+    and can run in a worker process. crawl is a (next link, follow pattern) pair when
+    crawling, whose links are then returned. skip_rows only follows the links.
+    """
+    strained = selectors
+    if crawl is not None:
+        strained = selectors + [tuple(crawl[0]) if crawl[0] else ('a', '#')]
+    started = time.perf_counter()
+    page_soup = parse(markup, parser, strained, targeted)
+    parsed = time.perf_counter()
+    links = find_links(page_soup, page, crawl[0], crawl[1]) if crawl is not None else []
+    rows, elements = ([], 0) if skip_rows else extract(page_soup, selectors)
+    return rows, elements, links, (parsed - started) * 1000, (time.perf_counter() - parsed) * 1000
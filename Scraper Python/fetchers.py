@@ -0,0 +1,66 @@
+"""
+Module contains the plain HTTP fetch engine used by the Scraper for
+server-rendered webpages that do not need a browser.
+"""
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HttpFetcher:
+    """
+    Fetches webpages over a pooled keep-alive HTTP session.
+
+    Connections to a host are reused between pages and gzip/deflate bodies are decoded
+    before the raw bytes are handed back, so BeautifulSoup can detect the encoding itself.
+
+    With a ResponseCache, cached webpages are revalidated with conditional requests. In
+    offline mode they are served from the cache only and nothing is sent over the network.
+    """
+
+    def __init__(self, connections=10, timeout=30, cache=None, offline=False):
+        self.timeout = timeout
+        self.cache = cache
+        self.offline = offline
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=connections, pool_maxsize=connections)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def fetch(self, url):
+        """Return the decoded body of url as bytes."""
+        if self.cache is None:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.content
+
+        entry = self.cache.get(url)
+        if self.offline:
+            if entry is None:
+                raise LookupError(f"{url} is not in the cache.")
+            return entry[0]
+        headers = {}
+        if entry is not None:
+            body, etag, last_modified = entry
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and entry is not None:
+            return entry[0]
+        response.raise_for_status()
+        self.cache.put(url, response.content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return response.content
+
+    def close(self):
+        """Close every pooled connection and the cache."""
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
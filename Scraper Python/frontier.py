@@ -0,0 +1,55 @@
+"""
+Module contains the crawl frontier used by the Scraper to discover webpages by
+following next-page links instead of enumerating them from a template.
+"""
+import hashlib
+
+
+def fingerprint(url):
+    """Return a compact 64-bit hash of url, which is what the frontier remembers."""
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class Frontier:
+    """
+    Queue of webpages still to crawl, with the set of every webpage already queued.
+
+    Only a 64-bit hash of each url is kept in the seen set so that large crawls stay small
+    in memory. Webpages are handed out one depth at a time; max_pages caps how many are
+    queued in total and max_depth how many links away from the seeds they may be. 0 means
+    no limit.
+    """
+
+    def __init__(self, max_pages=0, max_depth=0):
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.seen = set()
+        self.queued = 0
+        self.depth = 0
+        self.next_level = []
+
+    def add(self, url):
+        """Queue url one level deeper than the current one. Returns whether it was queued."""
+        if self.max_pages and self.queued >= self.max_pages:
+            return False
+        if self.max_depth and self.depth >= self.max_depth:
+            return False
+        key = fingerprint(url)
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        self.next_level.append(url)
+        self.queued += 1
+        return True
+
+    def levels(self):
+        """
+        Yield the queued webpages level by level.
+
+        The next level is only built from the links added while the previous one was
+        processed, so the caller must finish a level before asking for the next.
+        """
+        while self.next_level:
+            level, self.next_level = self.next_level, []
+            yield level
+            self.depth += 1
@@ -0,0 +1,112 @@
+"""
+Module contains the loading and checking of job spec files, which hold every
+setting of a scrape so that it can run without the console.
+
+A spec is a JSON or TOML file. Its keys are the ones in specKeys, for example:
+
+    file = "books.csv"
+    mode = "w"
+    initial_row = ["title", "price"]
+    initial_webpage = "https://example.com/books"
+    rpages = "https://example.com/books?page=$"
+    variable = 20
+    parser = "lxml"
+    fetcher = "http"
+    selectors = [["h3", "#"], ["p", "price_color"]]
+"""
+import json
+import os
+
+try:
+    import tomllib
+except ModuleNotFoundError:
+    try:
+        import tomli as tomllib
+    except ModuleNotFoundError:
+        tomllib = None
+
+# Spec key: (Scraper attribute, accepted type)
+specKeys = {
+    'file': ('csv_file', str),
+    'mode': ('csv_mode', str),
+    'initial_row': ('initial_row', list),
+    'output': ('output', str),
+    'batch': ('batch', int),
+    'snapshot': ('snapshot', str),
+    'keys': ('keys', list),
+    'shard': ('shard', str),
+    'dedup': ('dedup', str),
+    'dedup_keys': ('dedup_keys', list),
+    'dedup_capacity': ('dedup_capacity', int),
+    'initial_webpage': ('initial_webpage', str),
+    'rpages': ('rpages', str),
+    'variable': ('variable', int),
+    'source': ('source', str),
+    'feed': ('feed', str),
+    'next_link': ('next_link', list),
+    'follow': ('follow', str),
+    'max_depth': ('max_depth', int),
+    'max_pages': ('max_pages', int),
+    'parser': ('parser', str),
+    'targeted': ('targeted', bool),
+    'quiet': ('quiet', bool),
+    'log': ('log_file', str),
+    'fetcher': ('fetcher', str),
+    'workers': ('workers', int),
+    'host_limit': ('host_limit', int),
+    'delay': ('delay', (int, float)),
+    'processes': ('processes', int),
+    'retries': ('retries', int),
+    'backoff': ('backoff', (int, float)),
+    'adaptive': ('adaptive', bool),
+    'cache': ('cache', str),
+    'cache_dir': ('cache_dir', str),
+    'cache_size': ('cache_size', int),
+    'browsers': ('browsers', int),
+    'headless': ('headless', bool),
+    'recycle': ('recycle', int),
+    'selectors': ('selectors', list),
+}
+
+
+class SpecError(ValueError):
+    """Raised when a job spec file cannot be read or holds invalid settings."""
+
+
+def load_spec(path, choices=None):
+    """
+    Read a JSON or TOML job spec and return it as a dictionary of checked settings.
+
+    choices maps spec keys to the values they accept, such as the parsers of the Scraper.
+    """
+    try:
+        if os.path.splitext(path)[1].lower() == '.toml':
+            if tomllib is None:
+                raise SpecError("Reading TOML specs needs Python 3.11 or the tomli module.")
+            with open(path, 'rb') as file:
+                spec = tomllib.load(file)
+        else:
+            with open(path, encoding='utf-8') as file:
+                spec = json.load(file)
+    except (OSError, ValueError) as error:
+        raise SpecError(f"{path}: {error}")
+    if not isinstance(spec, dict):
+        raise SpecError(f"{path}: a spec must be a table of settings.")
+
+    for key, value in spec.items():
+        if key not in specKeys:
+            raise SpecError(f"{path}: unknown setting '{key}'.")
+        accepted = specKeys[key][1]
+        if not isinstance(value, accepted) or (isinstance(value, bool) and accepted is int):
+            raise SpecError(f"{path}: setting '{key}' has the wrong type.")
+        if choices and key in choices and value not in choices[key]:
+            raise SpecError(f"{path}: '{value}' is not an accepted {key}.")
+    start = 'feed' if spec.get('source') in ['sitemap', 'urls'] else 'initial_webpage'
+    for key in ['file', start, 'selectors']:
+        if key not in spec:
+            raise SpecError(f"{path}: setting '{key}' is required.")
+    for selector in spec['selectors']:
+        if not (isinstance(selector, list) and len(selector) == 2 and all(isinstance(x, str) for x in selector)):
+            raise SpecError(f"{path}: every selector must be an [element, class] pair. Use '#' for any class.")
+    spec['initial_row'] = [str(cell) for cell in spec.get('initial_row', [])]
+    return spec
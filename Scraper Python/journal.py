@@ -0,0 +1,79 @@
+"""
+Module contains the checkpoint journal that lets an interrupted scrape be
+resumed without fetching finished webpages again or duplicating rows.
+"""
+import json
+import os
+
+
+def journal_path(output):
+    """Return the path of the journal kept next to an output file."""
+    return output + '.journal'
+
+
+class Journal:
+    """
+    Append-only JSON Lines record of a scrape.
+
+    The first line holds the job settings and the output position before any rows. Every
+    other line records a batch of finished webpages with the number of rows written for
+    each, and the position of the output once the batch was flushed. Lines are fsynced
+    after the output itself, so the journal never claims rows that are not on disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def start(self, job, offset):
+        """Begin a new journal for job, replacing any previous one. offset is the output position to resume from."""
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self.file.write(json.dumps({"job": job, "offset": offset}) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def load(self):
+        """
+        Return (job, done, offset) of an existing journal and reopen it for appending.
+
+        done maps each finished webpage to its row count and offset is the output position
+        after the last finished webpage. A torn last line left by a crash is cut off.
+        """
+        job, done, offset, good = None, {}, None, 0
+        with open(self.path, 'rb') as file:
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                good += len(line)
+                if "job" in entry:
+                    job = entry["job"]
+                else:
+                    done.update(entry["pages"])
+                offset = entry["offset"]
+        if job is None:
+            raise ValueError(f"{self.path} does not hold a scrape job.")
+        with open(self.path, 'r+b') as file:
+            file.truncate(good)
+        self.file = open(self.path, 'a', encoding='utf-8')
+        return job, done, offset
+
+    def record(self, pages, offset):
+        """Record that the (page, rows) pairs in pages are finished and their rows flushed."""
+        self.file.write(json.dumps({"pages": pages, "offset": offset}) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
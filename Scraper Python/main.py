@@ -34,23 +34,57 @@ The application requires some peculiar things as well:
 
 Follow command documentation carefully.
 """
+import argparse
 import cmd
+import contextlib
 import csv
 import datetime as datetime
+import itertools
+import multiprocessing
 import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 try:
-    from bs4 import BeautifulSoup
     from colorama import init, Fore, Style
-    from selenium import webdriver
+    from cache import ResponseCache
+    from dedup import clear_filters, filterTypes, row_key
+    from drivers import DriverPool
+    from extract import process_page
+    from fetchers import HttpFetcher
+    from frontier import Frontier
+    from jobs import SpecError, load_spec, specKeys
+    from journal import Journal, journal_path
+    from scheduler import FetchScheduler, RetryPolicy
+    from search import SearchIndex, scan
+    from shards import merge_parts, parse_shard, part_path, shard_range
+    from snapshot import Snapshot, changeColumn
+    from sources import streamSources
+    from sinks import open_sink, sinkTypes
+    from stats import RunStats, stages
 except ModuleNotFoundError as error:
     print(f"{error}")
     print("You cannot run this script without this module.")
-    input()
+    if sys.stdin.isatty():
+        input()
     exit(1)
 init(autoreset=False)
 
 exitInputs = ['leave', 'break', 'quit', 'exit', 'end']
 acceptedParsers = ['lxml', 'html5lib', 'html.parser']
+acceptedFetchers = ['browser', 'http']
+cacheModes = ['off', 'on', 'offline']
+dedupModes = ['off'] + list(filterTypes)
+pageSources = ['template', 'crawl', 'sitemap', 'urls']
+# Values accepted by the settings of a job spec that only take a few.
+specChoices = {'parser': acceptedParsers, 'fetcher': acceptedFetchers, 'output': list(sinkTypes), 'cache': cacheModes,
+               'source': pageSources, 'dedup': dedupModes}
+# Settings saved in the journal of a scrape so that resume can run it again.
+jobSettings = ['initial_webpage', 'rpages', 'variable', 'source', 'feed', 'next_link', 'follow', 'max_depth',
+               'max_pages', 'parser', 'targeted', 'initial_row', 'output', 'batch', 'snapshot', 'keys', 'shard',
+               'dedup', 'dedup_keys', 'dedup_capacity', 'fetcher', 'cache', 'cache_dir', 'cache_size', 'browsers',
+               'headless', 'recycle', 'workers', 'host_limit', 'delay', 'processes', 'retries', 'backoff', 'adaptive']
 
 
 # noinspection PyUnusedLocal,PyUnboundLocalVariable
@@ -65,10 +99,42 @@ class Scraper(cmd.Cmd):
         self.csv_file = ""
         self.csv_mode = 'a'
         self.initial_row = []
+        self.output = 'csv'
+        self.batch = 500
+        self.search_index = False
+        self.snapshot = ''
+        self.keys = []
+        self.shard = ''
+        self.dedup = 'off'
+        self.dedup_keys = []
+        self.dedup_capacity = 10000000
         self.variable = 0
         self.initial_webpage = ''
         self.rpages = ''
+        self.source = 'template'
+        self.feed = ''
+        self.next_link = []
+        self.follow = ''
+        self.max_depth = 0
+        self.max_pages = 0
         self.parser = 'html5lib'
+        self.fetcher = 'browser'
+        self.targeted = True
+        self.quiet = False
+        self.log_file = ''
+        self.browsers = 1
+        self.headless = False
+        self.recycle = 100
+        self.workers = 1
+        self.host_limit = 0
+        self.delay = 0.0
+        self.processes = 0
+        self.retries = 3
+        self.backoff = 1.0
+        self.adaptive = True
+        self.cache = 'off'
+        self.cache_dir = './scraper_cache'
+        self.cache_size = 512
 
     # Functions for Setting Values
     def do_file(self, arg):
@@ -83,6 +149,92 @@ class Scraper(cmd.Cmd):
         """Specify the initial row of your CSV file."""
         self.initial_row = arg.split(',')
 
+    def do_output(self, arg):
+        """Set the format scraped rows are written in: output <csv/jsonl/sqlite>. The file command sets its path."""
+        if arg in sinkTypes:
+            self.output = str(arg)
+        else:
+            print(f"{Fore.RED}The output chosen does not exist. Choose csv, jsonl or sqlite.{Style.RESET_ALL}")
+
+    def do_batch(self, arg):
+        """Set how many rows are buffered before they are written and checkpointed in the journal."""
+        try:
+            self.batch = max(1, int(arg))
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_snapshot(self, arg):
+        """
+        Set a snapshot file that makes the scrape write only the rows changed since the last one.
+
+        Unchanged webpages are not extracted again, and every row written is preceded by
+        insert, update or delete. Rows no webpage has any more are deleted once a scrape
+        finishes every webpage. Empty turns the snapshot off.
+        """
+        self.snapshot = str(arg)
+
+    def do_keys(self, arg):
+        """Set the columns of the initial row that identify a row in the snapshot, separated by commas."""
+        self.keys = [key.strip() for key in arg.split(',')] if arg.strip() else []
+
+    def do_dedup(self, arg):
+        """
+        Drop rows already written to the chosen file, in this or earlier scrapes: dedup <off/exact/bloom>.
+
+        exact       remembers a 64-bit hash of every row, growing with the rows
+        bloom       keeps a Bloom filter of fixed size, which wrongly drops about 1 in 1000 new rows
+        clear       forgets every row written so far, as does a new scrape with a 'w' open mode
+        """
+        try:
+            if arg == 'clear':
+                clear_filters(self.target(self.csv_file))
+            elif arg in dedupModes:
+                self.dedup = str(arg)
+            else:
+                print(f"{Fore.RED}Specify off, exact, bloom or clear.{Style.RESET_ALL}")
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_dedupkeys(self, arg):
+        """Set the columns of the initial row rows are compared by, separated by commas. Empty compares every column."""
+        self.dedup_keys = [key.strip() for key in arg.split(',')] if arg.strip() else []
+
+    def do_dedupsize(self, arg):
+        """Set how many rows the Bloom filter is sized for. It is only sized when its file is created."""
+        try:
+            self.dedup_capacity = max(1, int(arg))
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_shard(self, arg):
+        """
+        Scrape only one shard of the webpages: shard <index>/<count>, such as 2/4. Empty scrapes all of them.
+
+        Each shard scrapes a contiguous range of the webpages into its own part file, named
+        after the file as <file>.part<index>of<count>, with its own journal and snapshot, so
+        shards can run in separate processes or on other machines. merge joins the parts.
+        """
+        try:
+            if arg:
+                parse_shard(arg)
+            self.shard = str(arg)
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_merge(self, arg):
+        """Merge the part files of the chosen file in shard order, dropping duplicate rows: merge <count>."""
+        try:
+            columns = [changeColumn] + self.initial_row if self.snapshot else self.initial_row
+            written, dropped = merge_parts(self.output, self.csv_file, int(arg), columns, self.batch)
+            print(f"{Fore.BLUE}Rows Merged: {Fore.GREEN}{written}")
+            print(f"{Fore.BLUE}Duplicates Dropped: {Fore.GREEN}{dropped}{Style.RESET_ALL}")
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def target(self, path):
+        """Return the path a file of the scrape is written to, which is its part file when sharded."""
+        return part_path(path, *parse_shard(self.shard)) if self.shard else path
+
     def do_setup(self, arg):
         """Setup CSV file essential settings."""
         try:
@@ -108,6 +260,53 @@ class Scraper(cmd.Cmd):
         """Set the template for the remainder of webpages."""
         self.rpages = str(arg)
 
+    def do_source(self, arg):
+        """
+        Set where the webpages to scrape come from: source <template/crawl/sitemap/urls>.
+
+        template    the initial webpage followed by the rpages template up to the variable
+        crawl       the initial webpage followed by the next-page links found while scraping
+        sitemap     the webpages of the sitemap or sitemap index set with feed
+        urls        the webpages of the URL-list file set with feed, one per line
+        """
+        if arg in pageSources:
+            self.source = str(arg)
+        else:
+            print(f"{Fore.RED}The source chosen does not exist. "
+                  f"Choose template, crawl, sitemap or urls.{Style.RESET_ALL}")
+
+    def do_feed(self, arg):
+        """Set the file or url of the sitemap or URL list the webpages come from. Gzipped files are accepted."""
+        self.feed = str(arg)
+
+    def do_next(self, arg):
+        """Set the element and class of the next-page links followed when crawling: next <element> <class/#>."""
+        array = arg.split()
+        if len(array) == 2:
+            self.next_link = array
+        elif not array:
+            self.next_link = []
+        else:
+            print(f"{Fore.RED}Specify an element and its class, '#' for any class.{Style.RESET_ALL}")
+
+    def do_follow(self, arg):
+        """Set a regular expression the links followed when crawling must match. Without next, every link is tried."""
+        self.follow = str(arg)
+
+    def do_depth(self, arg):
+        """Set how many links away from the initial webpage a crawl may go. 0 means no limit."""
+        try:
+            self.max_depth = max(0, int(arg))
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_maxpages(self, arg):
+        """Set how many webpages a crawl may scrape. 0 means no limit."""
+        try:
+            self.max_pages = max(0, int(arg))
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
     def do_parser(self, arg):
         """Set parser."""
         if arg in acceptedParsers:
@@ -115,16 +314,184 @@ class Scraper(cmd.Cmd):
         else:
             print(f"{Fore.RED}The parser chosen does not exist. See list of accepted parsers.{Style.RESET_ALL}")
 
+    def do_targeted(self, arg):
+        """Only build the scraped elements into the soup instead of the full page: targeted <on/off>."""
+        if arg in ['on', 'off']:
+            self.targeted = arg == 'on'
+        else:
+            print(f"{Fore.RED}Specify on or off.{Style.RESET_ALL}")
+
+    def do_quiet(self, arg):
+        """Only print the run report instead of every webpage and cell while scraping: quiet <on/off>."""
+        if arg in ['on', 'off']:
+            self.quiet = arg == 'on'
+        else:
+            print(f"{Fore.RED}Specify on or off.{Style.RESET_ALL}")
+
+    def do_log(self, arg):
+        """Set a JSON Lines file the timings and counters of every webpage are appended to. Empty disables it."""
+        self.log_file = str(arg)
+
+    def do_fetcher(self, arg):
+        """Set how webpages are fetched: fetcher <browser/http>. Use http for server-rendered pages."""
+        if arg in acceptedFetchers:
+            self.fetcher = str(arg)
+        else:
+            print(f"{Fore.RED}The fetcher chosen does not exist. Choose browser or http.{Style.RESET_ALL}")
+
+    def open_fetcher(self):
+        """Return the fetch engine chosen with the fetcher command. Offline replay always uses http."""
+        if self.fetcher == 'http' or self.cache == 'offline':
+            cache = None
+            if self.cache != 'off':
+                cache = ResponseCache(self.cache_dir, self.cache_size * 1024 * 1024)
+            return HttpFetcher(max(10, self.workers), cache=cache, offline=self.cache == 'offline')
+        if self.cache == 'on':
+            print(f"{Fore.RED}The browser fetcher is not cached, webpages are loaded from the network.{Style.RESET_ALL}")
+        return DriverPool(self.browsers, self.headless, self.recycle)
+
+    def do_cache(self, arg):
+        """
+        Set the response cache of the http fetcher: cache <off/on/offline>.
+
+        on          stores webpages and revalidates them with conditional requests
+        offline     replays webpages from the cache without using the network
+        clear       removes every cached webpage
+        """
+        try:
+            if arg == 'clear':
+                cache = ResponseCache(self.cache_dir, self.cache_size * 1024 * 1024)
+                cache.clear()
+                cache.close()
+            elif arg in cacheModes:
+                self.cache = str(arg)
+            else:
+                print(f"{Fore.RED}Specify off, on, offline or clear.{Style.RESET_ALL}")
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_cachedir(self, arg):
+        """Set the directory the response cache is kept in."""
+        self.cache_dir = str(arg)
+
+    def do_cachesize(self, arg):
+        """Set the maximum size of the response cache in MB. Least recently used webpages are evicted first."""
+        try:
+            self.cache_size = max(1, int(arg))
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_browsers(self, arg):
+        """Set the number of browser sessions kept open while scraping."""
+        try:
+            self.browsers = max(1, int(arg))
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_headless(self, arg):
+        """Run the browser sessions headless: headless <on/off>."""
+        if arg in ['on', 'off']:
+            self.headless = arg == 'on'
+        else:
+            print(f"{Fore.RED}Specify on or off.{Style.RESET_ALL}")
+
+    def do_recycle(self, arg):
+        """Set after how many pages a browser session is restarted. 0 never restarts it."""
+        try:
+            self.recycle = max(0, int(arg))
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_workers(self, arg):
+        """Set how many webpages are fetched at the same time."""
+        try:
+            self.workers = max(1, int(arg))
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_hostlimit(self, arg):
+        """Set how many webpages of the same host are fetched at the same time. 0 uses the workers value."""
+        try:
+            self.host_limit = max(0, int(arg))
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_delay(self, arg):
+        """Set the minimum number of seconds between two requests to the same host."""
+        try:
+            self.delay = max(0.0, float(arg))
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_retries(self, arg):
+        """Set how many times a failed fetch is retried before its webpage goes to the retry queue."""
+        try:
+            self.retries = max(0, int(arg))
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_backoff(self, arg):
+        """Set the base number of seconds of the exponential backoff between retries."""
+        try:
+            self.backoff = max(0.0, float(arg))
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_adaptive(self, arg):
+        """Adapt the number of concurrent fetches to latency and errors, up to workers: adaptive <on/off>."""
+        if arg in ['on', 'off']:
+            self.adaptive = arg == 'on'
+        else:
+            print(f"{Fore.RED}Specify on or off.{Style.RESET_ALL}")
+
+    def do_processes(self, arg):
+        """Set how many worker processes parse webpages while others are fetched. 0 parses in this process."""
+        try:
+            self.processes = max(0, int(arg))
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
     def do_info(self, arg):  # print server, port, username, password....
         """View the information you have entered so far."""
         print(Fore.RED)
         print("CSV File: " + self.csv_file)
         print("CSV Mode: " + self.csv_mode)
         print("Initial Row: " + str(self.initial_row))
+        print("Output: " + self.output)
+        print("Batch: " + str(self.batch))
+        print("Snapshot: " + self.snapshot)
+        print("Keys: " + str(self.keys))
+        print("Shard: " + self.shard)
+        print("Dedup: " + self.dedup)
+        print("Dedup Keys: " + str(self.dedup_keys))
+        print("Dedup Size: " + str(self.dedup_capacity))
         print("Initial Webpage: " + self.initial_webpage)
         print("Rest of Pages: " + self.rpages)
         print("Variable: " + str(self.variable))
+        print("Source: " + self.source)
+        print("Feed: " + self.feed)
+        print("Next Link: " + ' of class '.join(self.next_link))
+        print("Follow: " + self.follow)
+        print("Max Depth: " + str(self.max_depth))
+        print("Max Pages: " + str(self.max_pages))
         print("Parser: " + str(self.parser))
+        print("Targeted Parsing: " + str(self.targeted))
+        print("Fetcher: " + str(self.fetcher))
+        print("Quiet: " + str(self.quiet))
+        print("Log File: " + self.log_file)
+        print("Cache: " + str(self.cache))
+        print("Cache Directory: " + str(self.cache_dir))
+        print("Cache Size (MB): " + str(self.cache_size))
+        print("Browsers: " + str(self.browsers))
+        print("Headless: " + str(self.headless))
+        print("Recycle After: " + str(self.recycle))
+        print("Workers: " + str(self.workers))
+        print("Host Limit: " + str(self.host_limit))
+        print("Delay: " + str(self.delay))
+        print("Processes: " + str(self.processes))
+        print("Retries: " + str(self.retries))
+        print("Backoff: " + str(self.backoff))
+        print("Adaptive: " + str(self.adaptive))
         print(Style.RESET_ALL)
 
     @staticmethod
@@ -159,45 +526,84 @@ class Scraper(cmd.Cmd):
         print("11)ab+: Opens a file for both appending and reading in binary mode.")
         print(Style.RESET_ALL)
 
+    def webpages(self):
+        """
+        Return the webpages to scrape: the initial webpage followed by the template filled in
+        with page numbers 2 up to the variable, or only the initial webpage when crawling.
+        When sharded, only the range of the shard is returned.
+
+        Sitemaps and URL lists are returned as iterators reading the feed as they go, so
+        they are never held in memory. Sharding one reads the feed once more to count it.
+        """
+        if self.source == 'crawl':
+            return [self.initial_webpage]
+        if self.source in streamSources:
+            webpages = streamSources[self.source](self.feed)
+            if self.shard:
+                total = sum(1 for _ in streamSources[self.source](self.feed))
+                webpages = itertools.islice(webpages, *shard_range(total, *parse_shard(self.shard)))
+            return webpages
+        webpages = [self.initial_webpage] + [self.rpages.replace('$', str(x)) for x in range(2, self.variable + 1)]
+        if self.shard:
+            start, end = shard_range(len(webpages), *parse_shard(self.shard))
+            webpages = webpages[start:end]
+        return webpages
+
+    def job(self, selectors):
+        """Return the settings needed to run the scrape again, as saved in its journal."""
+        job = {setting: getattr(self, setting) for setting in jobSettings}
+        job["selectors"] = selectors
+        return job
+
+    def configure(self, spec):
+        """Apply the settings of a job spec loaded with load_spec."""
+        for key, value in spec.items():
+            if key != 'selectors':
+                setattr(self, specKeys[key][0], value)
+
+    def run_spec(self, spec):
+        """Run the scrape described by a job spec headless and return whether it finished."""
+        self.headless = True
+        self.configure(spec)
+        selectors = [(element.strip(), element_class.strip()) for (element, element_class) in spec['selectors']]
+        return self.scrape(self.webpages(), selectors)
+
+    def do_run(self, arg):
+        """Run the scrape described by a JSON or TOML job spec file: run <spec>."""
+        try:
+            self.run_spec(load_spec(arg, specChoices))
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
     def do_scrape(self, arg):
         """Scrape data from specified webpages."""
         print(f"\n{Fore.GREEN}Scraping Operation Initiated: ")
-        try:
-            csv_file = open(self.csv_file, self.csv_mode, newline='')
-            csv_writer = csv.writer(csv_file)
-            csv_writer.writerow(self.initial_row)
-
-            print(f"{Fore.BLUE}\nCSV File: {Fore.GREEN}" + self.csv_file)
-            print(f"{Fore.BLUE}CSV Mode: {Fore.GREEN}" + self.csv_mode)
-            print(f"{Fore.BLUE}Initial Row: {Fore.GREEN}" + str(self.initial_row))
+        print(f"{Fore.BLUE}\nCSV File: {Fore.GREEN}" + self.csv_file)
+        print(f"{Fore.BLUE}CSV Mode: {Fore.GREEN}" + self.csv_mode)
+        print(f"{Fore.BLUE}Initial Row: {Fore.GREEN}" + str(self.initial_row))
+        if self.source in streamSources:
+            print(f"{Fore.BLUE}Feed: {Fore.GREEN}" + self.feed)
+        else:
             print(f"{Fore.BLUE}Initial Webpage: {Fore.GREEN}" + self.initial_webpage)
             print(f"{Fore.BLUE}Rest of Pages: {Fore.GREEN}" + self.rpages)
             print(f"{Fore.BLUE}Variable: {Fore.GREEN}" + str(self.variable))
-            print(Style.RESET_ALL)
-        except Exception as e:
-            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
-
-        x = 2
-        webpages = [self.initial_webpage]
-        # noinspection PyBroadException
-        try:
-            while x < self.variable:
-                new_page = self.rpages.replace('$', str(x))
-                webpages.append(new_page)
-                x += 1
-        except Exception as e:
-            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
-            pass
+        print(Style.RESET_ALL)
 
         try:
-            print(Fore.BLUE)
-            print("\nWebpages: ")
-            for webpage in webpages:
-                print(Fore.GREEN)
-                print(webpage)
-            print(Style.RESET_ALL)
+            webpages = self.webpages()
         except Exception as e:
             print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+            return
+        if not self.quiet and isinstance(webpages, list):
+            try:
+                print(Fore.BLUE)
+                print("\nWebpages: ")
+                for webpage in webpages:
+                    print(Fore.GREEN)
+                    print(webpage)
+                print(Style.RESET_ALL)
+            except Exception as e:
+                print(f"{Fore.RED}{e}{Style.RESET_ALL}")
 
         elements_list = []
         class_list = []
@@ -216,55 +622,248 @@ class Scraper(cmd.Cmd):
         for (element, _class) in zip(elements_list, class_list):
             print(f"{Fore.BLUE}{element} of class = {Fore.GREEN}{_class}{Style.RESET_ALL}")
         print("\n")
+        selectors = [(element.strip(), element_class.strip()) for (element, element_class) in
+                     zip(elements_list, class_list)]
+        try:
+            self.scrape(webpages, selectors)
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
 
-        for page in webpages:
-            try:
-                print(f"\n{Fore.BLUE}Current Page: {Fore.GREEN}{page}{Style.RESET_ALL}")
-                driver = webdriver.Chrome()
-                driver.get(page)
-                page_soup = BeautifulSoup(driver.page_source, self.parser)
-            except Exception as e:
-                print(f"{Fore.RED}{e}{Style.RESET_ALL}")
-                break
+    def do_resume(self, arg):
+        """Resume an interrupted scrape of the chosen CSV file from its journal, skipping finished webpages."""
+        try:
+            journal = Journal(journal_path(self.target(self.csv_file)))
+            job, done, offset = journal.load()
+            for setting in jobSettings:
+                if setting in job:
+                    setattr(self, setting, job[setting])
+            selectors = [tuple(selector) for selector in job["selectors"]]
+            sinkTypes[self.output].truncate(self.target(self.csv_file), offset)
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+            return
+
+        print(f"\n{Fore.GREEN}Resuming Scraping Operation: ")
+        print(f"{Fore.BLUE}Finished Webpages: {Fore.GREEN}{len(done)}")
+        print(f"{Fore.BLUE}Rows Already Written: {Fore.GREEN}{sum(done.values())}{Style.RESET_ALL}")
+        try:
+            self.scrape(self.webpages(), selectors, journal, done)
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def scrape(self, webpages, selectors, journal=None, done=None):
+        """
+        Fetch the webpages, extract their rows and write them to the output file.
+
+        Rows are written in batches and the webpages they came from are recorded in the
+        journal of the output file once the batch is flushed. Without a journal a new one
+        is started and the output is opened in the chosen mode. Webpages in done are not
+        written again; when crawling they are still fetched to follow their links.
+
+        Webpages that fail even after the retries of the scheduler go to a retry queue that
+        is tried once more after the rest, and are reported at the end if they fail again.
+
+        When crawling, webpages are the seeds of the crawl and every level of links is
+        scraped once the previous level is finished.
 
-            print(Fore.RED)
-            individual_element_data = []
-            for (element, element_class) in zip(elements_list, class_list):
-                if element_class == '#':
-                    data = page_soup.find_all(element)
+        With a snapshot only the changes to the rows are written, see do_snapshot. With
+        dedup, rows already written are dropped, see do_dedup. The snapshot and the dedup
+        filter are committed after the journal, so a crash repeats rows rather than losing
+        them. On resume the webpages in done are marked as seen in the snapshot, so rows it
+        lost in the crash are inserted again rather than deleted.
+
+        Returns whether every webpage was scraped.
+        """
+        try:
+            if self.shard and self.source == 'crawl':
+                raise ValueError("A crawl cannot be split into shards.")
+            path = self.target(self.csv_file)
+            columns = self.initial_row
+            snapshot = contextlib.nullcontext()
+            if self.snapshot:
+                keys = [self.initial_row.index(key) for key in self.keys]
+                columns = [changeColumn] + self.initial_row
+                snapshot = Snapshot(self.target(self.snapshot), keys)
+                if journal is None:
+                    snapshot.begin()
                 else:
-                    element = str(element.strip())
-                    _class = str(element_class.strip())
-                    print(element, _class)
-                    data = page_soup.find_all(element, class_=_class)
-                individual_element_data.append(data)
-
-            print(f"\n{Fore.BLUE}Scraped Data From Elements: {Fore.GREEN}\n{individual_element_data}")
-
-            length_of_element_data = len(individual_element_data[0])
-            print(
-                f"\n{Fore.BLUE}Number of Elements Scraped in this Page: {Fore.GREEN}{length_of_element_data}")
-
-            print(f"\n{Fore.RED}Now Writing to CSV File: {Fore.GREEN}")
-            x = 0
-            while x < length_of_element_data:
-                row = []
-                for element_data in individual_element_data:
-                    list_length = len(element_data)
-                    row.append((element_data[x]).text.strip())
-                    print(f"{x + 1}) {(element_data[x]).text.strip()}")
-                x += 1
-                csv_writer.writerow(row)
+                    # pages the journal finished may have lost their snapshot updates in the crash
+                    for page in done or {}:
+                        snapshot.touch(page)
+                    snapshot.commit()
+            dedup = contextlib.nullcontext()
+            if self.dedup != 'off':
+                if self.snapshot:
+                    raise ValueError("A snapshot already writes every row once. Turn dedup off to use it.")
+                dedup_keys = [self.initial_row.index(key) for key in self.dedup_keys]
+                if journal is None and 'w' in self.csv_mode:
+                    clear_filters(path)
+                dedup = filterTypes[self.dedup](path, self.dedup_capacity)
+            if journal is None:
+                sink = open_sink(self.output, path, columns, self.batch, self.csv_mode)
+                journal = Journal(journal_path(path))
+                journal.start(self.job(selectors), sink.flush())
+            else:
+                sink = open_sink(self.output, path, columns, self.batch, 'a', header=False)
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+            return False
+
+        def timed_fetch(url):
+            started = time.perf_counter()
+            body = fetcher.fetch(url)
+            return body, (time.perf_counter() - started) * 1000
 
+        def skipped(page, body):
+            """Return whether the rows of a webpage are not needed: it is done or unchanged since the snapshot."""
+            return page in done or (snapshot is not None and snapshot.unchanged(page, body))
+
+        def checkpoint():
+            journal.record(finished, sink.flush())
+            if snapshot is not None:
+                snapshot.commit()
+            if dedup is not None:
+                dedup.commit()
+
+        def pipeline(level):
+            """
+            Yield (page, fetched, skip, parsing) in page order. Without a process pool skip and
+            parsing are None; otherwise parsing is the pending result of process_page in a
+            worker, and a bounded window of webpages is parsed while the next ones are fetched.
+            """
+            pending = deque()
+            for page, fetched in scheduler.map(timed_fetch, level):
+                if pool is None:
+                    yield page, fetched, None, None
+                    continue
+                skip = parsing = None
+                if fetched.exception() is None:
+                    skip = skipped(page, fetched.result()[0])
+                    if crawl is not None or not skip:
+                        parsing = pool.apply_async(process_page, (fetched.result()[0], page, self.parser, selectors,
+                                                                  self.targeted, crawl, skip))
+                pending.append((page, fetched, skip, parsing))
+                if len(pending) >= self.processes * 2:
+                    yield pending.popleft()
+            while pending:
+                yield pending.popleft()
+
+        done = done or {}
+        frontier = None
+        crawl = None
+        if self.source == 'crawl':
+            frontier = Frontier(self.max_pages, self.max_depth)
+            for webpage in webpages:
+                frontier.add(webpage)
+            levels = frontier.levels()
+            crawl = (self.next_link, self.follow)
+        else:
+            levels = [(webpage for webpage in webpages if webpage not in done)]
+
+        scheduler = FetchScheduler(self.workers, self.host_limit, self.delay,
+                                   RetryPolicy(self.retries, self.backoff), self.adaptive)
+        finished = []
+        failed = []
+        dropped = 0
+        stats = RunStats(self.log_file)
+        processes = multiprocessing.Pool(self.processes) if self.processes else contextlib.nullcontext()
+        with sink, journal, stats, snapshot as snapshot, dedup as dedup, processes as pool, \
+                self.open_fetcher() as fetcher:
+            for level in levels:
+                queue, retrying = level, False
+                while True:
+                    retry_queue = []
+                    for page, fetched, skip, parsing in pipeline(queue):
+                        try:
+                            if not self.quiet:
+                                print(f"\n{Fore.BLUE}Current Page: {Fore.GREEN}{page}{Style.RESET_ALL}")
+                            body, fetch_ms = fetched.result()
+                            if skip is None:
+                                skip = skipped(page, body)
+                            if parsing is None and crawl is None and skip:
+                                parsing = [], 0, [], 0.0, 0.0
+                            elif parsing is None:
+                                parsing = process_page(body, page, self.parser, selectors, self.targeted, crawl,
+                                                       skip)
+                            else:
+                                parsing = parsing.get()
+                            rows, elements, links, parse_ms, extract_ms = parsing
+                        except Exception as e:
+                            print(f"{Fore.RED}{page}: {e}{Style.RESET_ALL}")
+                            (retry_queue if RetryPolicy.retryable(e) else failed).append(page)
+                            continue
+                        for link in links:
+                            frontier.add(link)
+                        if page in done:
+                            continue
+                        if snapshot is not None:
+                            if skip:
+                                snapshot.touch(page)
+                            else:
+                                rows = snapshot.diff(page, body, rows)
+                        if dedup is not None:
+                            fresh = [row for row in rows if dedup.add(row_key(row, dedup_keys))]
+                            dropped += len(rows) - len(fresh)
+                            rows = fresh
+
+                        if not self.quiet:
+                            print(
+                                f"\n{Fore.BLUE}Number of Elements Scraped in this Page: {Fore.GREEN}{len(rows)}")
+                            print(f"\n{Fore.RED}Now Writing to {self.output.upper()} File: {Fore.GREEN}")
+                            for x, row in enumerate(rows):
+                                for cell in row:
+                                    print(f"{x + 1}) {cell}")
+                        written = time.perf_counter()
+                        sink.write_rows(rows)
+                        finished.append((page, len(rows)))
+                        if not sink.buffer:  # a full batch has just been written out
+                            checkpoint()
+                            finished = []
+                        stats.record(page, {"fetch": fetch_ms, "parse": parse_ms, "extract": extract_ms,
+                                            "write": (time.perf_counter() - written) * 1000},
+                                     len(body), elements, len(rows))
+                    if not retry_queue or retrying:
+                        break
+                    print(f"\n{Fore.BLUE}Retrying Failed Webpages: {Fore.GREEN}{len(retry_queue)}{Style.RESET_ALL}")
+                    queue, retrying = retry_queue, True
+                failed.extend(retry_queue)
+            if snapshot is not None and not failed:
+                sink.write_rows(snapshot.deletes())
+                checkpoint()
+            elif finished:
+                checkpoint()
+
+        self.report(stats.summary())
+        if self.dedup != 'off':
+            print(f"{Fore.BLUE}Duplicate Rows Dropped: {Fore.GREEN}{dropped}{Style.RESET_ALL}")
+        if failed:
+            print(f"{Fore.RED}Failed Webpages ({len(failed)}), type 'resume' to try them again:")
+            for page in failed:
+                print(page)
+            print(Style.RESET_ALL)
         print(f"\n{Fore.GREEN}Scraping Operation Terminated Successfully.\n{Style.RESET_ALL}")
+        return not failed
+
+    @staticmethod
+    def report(summary):
+        """Print the run report of a scrape."""
+        print(f"\n{Fore.BLUE}Pages: {Fore.GREEN}{summary['pages']}")
+        print(f"{Fore.BLUE}Rows: {Fore.GREEN}{summary['rows']}")
+        print(f"{Fore.BLUE}Elements: {Fore.GREEN}{summary['elements']}")
+        print(f"{Fore.BLUE}Bytes: {Fore.GREEN}{summary['bytes']}")
+        print(f"{Fore.BLUE}Seconds: {Fore.GREEN}{summary['seconds']}")
+        print(f"{Fore.BLUE}Pages/Second: {Fore.GREEN}{summary['pages_per_sec']}")
+        for stage in stages:
+            print(f"{Fore.BLUE}{stage.capitalize()} p50/p95 (ms): {Fore.GREEN}"
+                  f"{summary[stage + '_p50_ms']} / {summary[stage + '_p95_ms']}")
+        print(Style.RESET_ALL)
 
     # CSV Functions
     def do_wrow(self, arg):
         """Write in a row in the chosen CSV file."""
         try:
-            csv_file = open(self.csv_file, self.csv_mode, newline='')
-            csv_writer = csv.writer(csv_file)
-            csv_writer.writerow(arg.split(','))
+            with open(self.csv_file, self.csv_mode, newline='') as csv_file:
+                csv.writer(csv_file).writerow(arg.split(','))
         except Exception as e:
             print(f"{Fore.RED}{e}{Style.RESET_ALL}")
 
@@ -304,9 +903,43 @@ class Scraper(cmd.Cmd):
             print(f"{Fore.RED}{e}{Style.RESET_ALL}")
 
     def do_scsv(self, arg):
-        """Search for word or sentence in the chosen CSV file."""
+        """
+        Search for word or sentence in the chosen CSV file, ignoring case.
+
+        scsv <text>             rows containing the text
+        scsv re <pattern>       rows matching the regular expression
+        """
         try:
-            os.system(f"FIND \"{str(arg)}\" {self.csv_file}")
+            quoted = self.output == 'csv'
+            if arg.startswith('re '):
+                results = scan(self.csv_file, arg[3:], regex=True, quoted=quoted)
+            elif self.search_index:
+                with SearchIndex(self.csv_file, quoted) as index:
+                    results = index.search(arg)
+            else:
+                results = scan(self.csv_file, arg, quoted=quoted)
+            print(Fore.GREEN)
+            for row, line in results:
+                print(f"{Fore.BLUE}{row}) {Fore.GREEN}{line}")
+            print(f"\n{Fore.BLUE}Matching Rows: {Fore.GREEN}{len(results)}{Style.RESET_ALL}")
+        except Exception as e:
+            print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+
+    def do_index(self, arg):
+        """
+        Search the chosen CSV file through a word index saved next to it: index <on/off/build>.
+
+        The index is rebuilt by itself whenever the file has changed. build rebuilds it now.
+        """
+        try:
+            if arg in ['on', 'off']:
+                self.search_index = arg == 'on'
+            elif arg == 'build':
+                with SearchIndex(self.csv_file, self.output == 'csv') as index:
+                    index.build()
+                print(f"{Fore.GREEN}Index Built.{Style.RESET_ALL}")
+            else:
+                print(f"{Fore.RED}Specify on, off or build.{Style.RESET_ALL}")
         except Exception as e:
             print(f"{Fore.RED}{e}{Style.RESET_ALL}")
 
@@ -369,6 +1002,12 @@ class Scraper(cmd.Cmd):
         print("6. If there is no specific class, type '#'.")
         print("7. If there are no more elements to scrape, type 'end'.")
         print("8. The scraping process will start instantly.")
+        print("9. If the scraping process is interrupted, type 'resume' to continue it from its journal.")
+        print("10. To follow next-page links instead of a template, type 'source crawl' and set them with 'next'.")
+        print("11. To write only the rows changed since the last scrape, set a 'snapshot' file and its 'keys'.")
+        print("12. To split a scrape between processes or machines, run every 'shard' of it and 'merge' the parts.")
+        print("13. To scrape the webpages of a sitemap or URL list, type 'source sitemap' or 'source urls' and 'feed'.")
+        print("14. To drop rows already written, across webpages and scrapes, type 'dedup exact' or 'dedup bloom'.")
 
     @staticmethod
     def do_exit(arg):
@@ -376,6 +1015,46 @@ class Scraper(cmd.Cmd):
         quit()
 
 
+def run_specs(paths, jobs=1, shard=None):
+    """
+    Run job spec files without the console, up to jobs of them at the same time. shard, as
+    index/count, replaces the shard of every spec.
+
+    Returns the exit code: 0 if every scrape finished, 1 if any scrape failed and 2 if any
+    spec could not be loaded, in which case nothing is run.
+    """
+    try:
+        specs = [load_spec(path, specChoices) for path in paths]
+        if shard is not None:
+            parse_shard(shard)
+            for spec in specs:
+                spec['shard'] = shard
+    except (SpecError, ValueError) as e:
+        print(f"{Fore.RED}{e}{Style.RESET_ALL}")
+        return 2
+
+    def run(spec):
+        try:
+            return Scraper().run_spec(spec)
+        except Exception as error:
+            print(f"{Fore.RED}{error}{Style.RESET_ALL}")
+            return False
+
+    with ThreadPoolExecutor(max(1, jobs)) as pool:
+        results = list(pool.map(run, specs))
+    for path, result in zip(paths, results):
+        print(f"{Fore.BLUE}{path}: {Fore.GREEN if result else Fore.RED}{'finished' if result else 'failed'}"
+              f"{Style.RESET_ALL}")
+    return 0 if all(results) else 1
+
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        argparser = argparse.ArgumentParser(description='Run Scraper job spec files without the console.')
+        argparser.add_argument('specs', nargs='+', help='JSON or TOML job spec files.')
+        argparser.add_argument('-j', '--jobs', type=int, default=1, help='Number of specs run at the same time.')
+        argparser.add_argument('--shard', help='Only run shard index/count of every spec, such as 2/4.')
+        opts = argparser.parse_args()
+        sys.exit(run_specs(opts.specs, opts.jobs, opts.shard))
     scraper = Scraper()
     scraper.cmdloop()
@@ -0,0 +1,203 @@
+"""
+Module contains the fetch scheduler used by the Scraper to download several
+webpages at once while handing them back in page order, retrying failed
+fetches and adapting how many run at the same time.
+"""
+import email.utils
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# Status codes worth retrying, and the ones that mean the host wants us to slow down.
+retryStatuses = {408, 425, 429, 500, 502, 503, 504}
+throttleStatuses = {429, 503}
+
+
+def status_of(error):
+    """Return the HTTP status of a failed fetch, or None if it failed before getting a response."""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def retry_after(error):
+    """Return the seconds a Retry-After header of a failed fetch asks to wait, or None."""
+    response = getattr(error, 'response', None)
+    value = getattr(response, 'headers', {}).get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for failed fetches.
+
+    Network errors and the statuses in retryStatuses are retried up to retries times, any
+    other error is raised at once. A Retry-After header is honoured over the backoff.
+    """
+
+    def __init__(self, retries=3, backoff=1.0, max_backoff=60.0):
+        self.retries = max(0, int(retries))
+        self.backoff = float(backoff)
+        self.max_backoff = float(max_backoff)
+
+    @staticmethod
+    def retryable(error):
+        if isinstance(error, LookupError):  # a webpage missing from the offline cache
+            return False
+        status = status_of(error)
+        return status is None or status in retryStatuses
+
+    def wait(self, attempt, error):
+        """Return the seconds to wait before retry number attempt, counted from 0."""
+        asked = retry_after(error)
+        if asked is not None:
+            return min(asked, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit adjusted AIMD-style between minimum and maximum.
+
+    Every fetch that succeeds in good time raises the limit by 1/limit, so about one more
+    fetch is allowed per round of fetches. A failure, a throttling status or a latency
+    over slowdown times the best average seen halves it, at most once per round.
+    """
+
+    def __init__(self, maximum, minimum=1, slowdown=3.0):
+        self.maximum = max(1, int(maximum))
+        self.minimum = max(1, min(int(minimum), self.maximum))
+        self.slowdown = slowdown
+        self.limit = float(self.maximum)
+        self.active = 0
+        self.average = None
+        self.best = None
+        self._since_decrease = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.active >= int(self.limit):
+                self._condition.wait()
+            self.active += 1
+
+    def release(self, latency, failed=False, throttled=False):
+        with self._condition:
+            self.active -= 1
+            self._since_decrease += 1
+            congested = failed or throttled
+            if not failed:
+                self.average = latency if self.average is None else 0.8 * self.average + 0.2 * latency
+                self.best = self.average if self.best is None else min(self.best, self.average)
+                congested = congested or latency > self.best * self.slowdown
+            if congested:
+                if self._since_decrease >= self.limit:
+                    self.limit = max(float(self.minimum), self.limit / 2)
+                    self._since_decrease = 0
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class FetchScheduler:
+    """
+    Runs fetches on a thread pool with a global and a per-host concurrency limit.
+
+    A politeness delay spaces out the requests sent to the same host. Failed fetches are
+    retried with the RetryPolicy, and a Retry-After pauses the whole host. With adaptive on,
+    the global limit follows an AdaptiveLimit instead of staying at workers. Results are
+    yielded in the order the webpages were given, whatever order the fetches complete in.
+    """
+
+    def __init__(self, workers=1, per_host=0, delay=0.0, policy=None, adaptive=True):
+        self.workers = max(1, int(workers))
+        self.per_host = int(per_host) or self.workers
+        self.delay = float(delay)
+        self.policy = policy or RetryPolicy()
+        self.limit = AdaptiveLimit(self.workers) if adaptive else None
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._next_start = {}
+
+    def _host_slot(self, host):
+        with self._lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._slots[host]
+
+    def _wait_turn(self, host):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+    def _pause_host(self, host, seconds):
+        with self._lock:
+            self._next_start[host] = max(self._next_start.get(host, 0.0), time.monotonic() + seconds)
+
+    def _attempt(self, fetch, url, host):
+        with self._host_slot(host):
+            self._wait_turn(host)
+            if self.limit is None:
+                return fetch(url)
+            self.limit.acquire()
+            started = time.monotonic()
+            try:
+                result = fetch(url)
+            except Exception as error:
+                self.limit.release(time.monotonic() - started, True, status_of(error) in throttleStatuses)
+                raise
+            self.limit.release(time.monotonic() - started)
+            return result
+
+    def call(self, fetch, url):
+        """
+        Run fetch(url) once the host has a free slot and the politeness delay has passed,
+        retrying it while the RetryPolicy allows.
+        """
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(fetch, url, host)
+            except Exception as error:
+                if attempt >= self.policy.retries or not self.policy.retryable(error):
+                    raise
+                wait = self.policy.wait(attempt, error)
+                if retry_after(error) is not None:
+                    self._pause_host(host, wait)  # _wait_turn holds back every fetch of the host
+                    wait = 0
+            time.sleep(wait)
+            attempt += 1
+
+    def map(self, fetch, urls):
+        """
+        Yield (url, future) pairs in the order of urls.
+
+        Only a bounded window of fetches is in flight, so urls may be a lazy iterable.
+        Fetches still queued are cancelled if the caller stops iterating early.
+        """
+        pool = ThreadPoolExecutor(self.workers)
+        pending = deque()
+        try:
+            for url in urls:
+                pending.append((url, pool.submit(self.call, fetch, url)))
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft()
+            while pending:
+                yield pending.popleft()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,186 @@
+"""
+Module contains the in-process search over scraped output files, either by
+scanning a memory-mapped file or through a persisted inverted index.
+"""
+import mmap
+import os
+import re
+import sqlite3
+
+tokenPattern = re.compile(rb'\w+')
+window = 1024 * 1024
+
+
+class RowCursor:
+    """
+    Walks a memory-mapped file forward in windows of fixed size, counting the rows that end on the way.
+
+    In a CSV file a newline only ends a row outside quotes, as the csv module quotes every
+    field holding a quote or a newline, so whether the cursor is inside quotes is carried
+    across windows. Without quoted every newline ends a row. Only a window is copied out
+    of the file at a time.
+    """
+
+    def __init__(self, mapped, quoted=True):
+        self.mapped = mapped
+        self.quoted = quoted
+        self.position = 0
+        self.inside = False
+        self.row = 1
+        self.start = 0
+
+    def walk(self, end, stop=False):
+        """
+        Walk to end, keeping the number and the offset of the row the cursor is in. With stop,
+        stop instead just past the first newline ending a row and return its offset, or -1.
+        """
+        while self.position < end:
+            limit = min(end, self.position + window)
+            chunk = self.mapped[self.position:limit]
+            offset = self.position
+            for x, piece in enumerate(chunk.split(b'"') if self.quoted else [chunk]):
+                if x:
+                    self.inside = not self.inside
+                    offset += 1
+                if not self.inside:
+                    found = piece.find(b'\n') if stop else piece.rfind(b'\n')
+                    if found != -1:
+                        self.row += 1 if stop else piece.count(b'\n')
+                        self.start = offset + found + 1
+                        if stop:
+                            self.position = self.start
+                            return offset + found
+                offset += len(piece)
+            self.position = limit
+        return -1
+
+
+def read_record(file, quoted=True):
+    """Read the row starting at the position of a binary file, however many lines it spans."""
+    record = file.readline()
+    while quoted and record.count(b'"') % 2:
+        line = file.readline()
+        if not line:
+            break
+        record += line
+    return record
+
+
+def scan(path, pattern, regex=False, quoted=True):
+    """
+    Return (row, text) pairs of every row of path matching pattern, case-insensitively.
+
+    The file is memory-mapped and searched in place, so only the matching rows are ever
+    decoded. Rows are counted from 1, header included, and each row is reported once.
+    quoted reads path as CSV, where quoted fields may span lines; otherwise every line
+    is a row.
+    """
+    expression = pattern.encode('utf-8') if regex else re.escape(pattern.encode('utf-8'))
+    compiled = re.compile(expression, re.IGNORECASE | re.MULTILINE)
+    results = []
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return results
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            cursor = RowCursor(mapped, quoted)
+            while cursor.position < len(mapped):
+                match = compiled.search(mapped, cursor.position)
+                if match is None:
+                    break
+                cursor.walk(match.start())
+                row, start = cursor.row, cursor.start
+                end = cursor.walk(len(mapped), stop=True)
+                end = len(mapped) if end == -1 else end
+                results.append((row, mapped[start:end].rstrip(b'\r').decode('utf-8', 'replace')))
+    return results
+
+
+class SearchIndex:
+    """
+    Inverted index of the words in every row of a file, kept in <file>.idx.db.
+
+    The index remembers the size and modification time of the file it was built from and
+    is rebuilt automatically once they change. quoted is read as in scan().
+    """
+
+    def __init__(self, path, quoted=True):
+        self.path = path
+        self.quoted = quoted
+        self.conn = sqlite3.connect(path + '.idx.db')
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS lines (row INTEGER PRIMARY KEY, offset INTEGER);")
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS postings (
+                                 token TEXT,
+                                 row INTEGER,
+                                 PRIMARY KEY (token, row)
+            ) WITHOUT ROWID;""")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _stamp(self):
+        stat = os.stat(self.path)
+        return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "quoted": int(self.quoted)}
+
+    def stale(self):
+        """Return whether the file changed since the index was built."""
+        stored = dict(self.conn.execute("SELECT key, value FROM meta;").fetchall())
+        return stored != self._stamp()
+
+    def build(self, batch=10000):
+        """Rebuild the index from the file in one transaction, in batches of batch rows."""
+        stamp = self._stamp()
+        with self.conn:
+            self.conn.execute("DELETE FROM meta;")
+            self.conn.execute("DELETE FROM lines;")
+            self.conn.execute("DELETE FROM postings;")
+            lines, postings = [], []
+            offset = 0
+            with open(self.path, 'rb') as file:
+                for row, line in enumerate(iter(lambda: read_record(file, self.quoted), b''), 1):
+                    lines.append((row, offset))
+                    offset += len(line)
+                    postings.extend((token, row) for token in
+                                    {token.decode('utf-8', 'replace').lower() for token in tokenPattern.findall(line)})
+                    if len(lines) >= batch:
+                        self.conn.executemany("INSERT INTO lines VALUES (?, ?);", lines)
+                        self.conn.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?);", postings)
+                        lines, postings = [], []
+            self.conn.executemany("INSERT INTO lines VALUES (?, ?);", lines)
+            self.conn.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?);", postings)
+            self.conn.executemany("INSERT INTO meta VALUES (?, ?);", stamp.items())
+
+    def search(self, text):
+        """
+        Return (row, text) pairs of the rows containing text, case-insensitively.
+
+        Candidate rows are the ones holding a word starting with each word of text; they
+        are then read back and checked. Unlike scan(), text found only inside a word, such
+        as 'rime' in 'crime', is not found.
+        """
+        if self.stale():
+            self.build()
+        tokens = {token.decode('utf-8').lower() for token in tokenPattern.findall(text.encode('utf-8'))}
+        if not tokens:
+            return scan(self.path, text, quoted=self.quoted)
+        query = " INTERSECT ".join(["SELECT row FROM postings WHERE token >= ? AND token < ?"] * len(tokens))
+        bounds = [bound for token in tokens for bound in (token, token + '\uffff')]
+        candidates = self.conn.execute(f"""SELECT lines.row, lines.offset FROM lines
+                                           WHERE lines.row IN ({query}) ORDER BY lines.row;""",
+                                       bounds).fetchall()
+        needle = text.lower()
+        results = []
+        with open(self.path, 'rb') as file:
+            for row, offset in candidates:
+                file.seek(offset)
+                line = read_record(file, self.quoted).rstrip(b'\r\n').decode('utf-8', 'replace')
+                if needle in line.lower():
+                    results.append((row, line))
+        return results
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,63 @@
+"""
+Module contains the splitting of a scrape into shards that can run in separate
+processes or on other machines, and the merge of their part files.
+"""
+import json
+import os
+
+from sinks import open_sink, sinkTypes
+from snapshot import digest
+
+
+def parse_shard(text):
+    """Return (index, count) of a shard written as index/count, counted from 1."""
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f"'{text}' is not a shard. Write it as index/count, such as 2/4.")
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard {index} does not exist in {count} shards.")
+    return index, count
+
+
+def shard_range(total, index, count):
+    """
+    Return the (start, end) slice of total items that shard index of count scrapes.
+
+    Shards get contiguous ranges differing by at most one item, so the part files put one
+    after the other are in the order of the whole job.
+    """
+    size, extra = divmod(total, count)
+    start = (index - 1) * size + min(index - 1, extra)
+    return start, start + size + (index <= extra)
+
+
+def part_path(path, index, count):
+    """Return the path of the part file shard index of count writes instead of path."""
+    return f"{path}.part{index}of{count}"
+
+
+def merge_parts(kind, path, count, columns, batch=500):
+    """
+    Write the rows of the count part files of path into path, in shard order, dropping
+    rows already written. Returns (rows written, duplicates dropped).
+
+    Every part must exist. Only a 64-bit hash of each row is kept to spot duplicates.
+    """
+    parts = [part_path(path, index, count) for index in range(1, count + 1)]
+    missing = [part for part in parts if not os.path.exists(part)]
+    if missing:
+        raise FileNotFoundError(f"Missing part files: {', '.join(missing)}")
+    seen = set()
+    written = dropped = 0
+    with open_sink(kind, path, columns, batch, 'w') as sink:
+        for part in parts:
+            for row in sinkTypes[kind].read(part, columns):
+                key = digest(json.dumps(row))
+                if key in seen:
+                    dropped += 1
+                    continue
+                seen.add(key)
+                sink.write(row)
+                written += 1
+    return written, dropped
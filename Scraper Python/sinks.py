@@ -0,0 +1,195 @@
+"""
+Module contains the output sinks the Scraper writes its rows to. Rows are
+buffered and written in batches, and flush() makes them durable.
+"""
+import csv
+import json
+import os
+import sqlite3
+
+
+class Sink:
+    """
+    Base of the output sinks.
+
+    write_rows() only buffers. Once batch rows are buffered they are written out, and
+    flush() writes the rest, makes everything durable and returns the position of the
+    output, which truncate() can later cut the output back to.
+    """
+
+    def __init__(self, path, columns, batch=500):
+        self.path = path
+        self.columns = list(columns)
+        self.batch = max(1, int(batch))
+        self.buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write_rows(self, rows):
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.batch:
+            self._write_batch(self.buffer)
+            self.buffer = []
+
+    def write(self, row):
+        self.write_rows([row])
+
+    def flush(self):
+        if self.buffer:
+            self._write_batch(self.buffer)
+            self.buffer = []
+        return self._sync()
+
+    def close(self):
+        self.flush()
+        self._close()
+
+    def _write_batch(self, rows):
+        raise NotImplementedError
+
+    def _sync(self):
+        raise NotImplementedError
+
+    def _close(self):
+        raise NotImplementedError
+
+
+class FileSink(Sink):
+    """Sink writing to a text file. Its position is the size of the file in bytes."""
+
+    def __init__(self, path, columns, batch=500, mode='a'):
+        super().__init__(path, columns, batch)
+        self.file = open(path, mode, newline='', encoding='utf-8')
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return os.fstat(self.file.fileno()).st_size
+
+    def _close(self):
+        self.file.close()
+
+    @staticmethod
+    def truncate(path, position):
+        with open(path, 'r+b') as file:
+            file.truncate(position)
+
+
+class CsvSink(FileSink):
+    """Writes rows to a CSV file, starting with the columns as its initial row."""
+
+    def __init__(self, path, columns, batch=500, mode='a', header=True):
+        super().__init__(path, columns, batch, mode)
+        self.writer = csv.writer(self.file)
+        if header:
+            self.writer.writerow(self.columns)
+
+    def _write_batch(self, rows):
+        self.writer.writerows(rows)
+
+    @staticmethod
+    def read(path, columns):
+        """Yield the rows of a CSV file, leaving out its initial row if it is the columns."""
+        with open(path, newline='', encoding='utf-8') as file:
+            for x, row in enumerate(csv.reader(file)):
+                if x or row != list(columns):
+                    yield row
+
+
+class JsonlSink(FileSink):
+    """Writes rows to a JSON Lines file, one object per row keyed by the columns."""
+
+    def _keys(self, row):
+        if len(self.columns) == len(row):
+            return self.columns
+        return [f"column{x + 1}" for x in range(len(row))]
+
+    def _write_batch(self, rows):
+        self.file.write(''.join(json.dumps(dict(zip(self._keys(row), row))) + '\n' for row in rows))
+
+    @staticmethod
+    def read(path, columns):
+        """Yield the rows of a JSON Lines file as lists of cells."""
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield list(json.loads(line).values())
+
+
+class SqliteSink(Sink):
+    """
+    Writes rows to the rows table of a SQLite database with executemany, one transaction
+    per batch. Its position is the rowid of the last row.
+    """
+
+    def __init__(self, path, columns, batch=500, mode='a'):
+        super().__init__(path, columns, batch)
+        self.conn = sqlite3.connect(path)
+        self.width = None
+        if mode.startswith('w'):
+            with self.conn:
+                self.conn.execute("DROP TABLE IF EXISTS rows;")
+
+    def _create(self, width):
+        names = list(self.columns) if len(self.columns) == width else [f"column{x + 1}" for x in range(width)]
+        existing = [column[1] for column in self.conn.execute("PRAGMA table_info(rows);")]
+        if existing:
+            self.width = len(existing)
+            return
+        fields = ', '.join('"' + str(name).replace('"', '""') + '" TEXT' for name in names)
+        with self.conn:
+            self.conn.execute(f"CREATE TABLE rows ({fields});")
+        self.width = width
+
+    def _write_batch(self, rows):
+        if self.width is None:
+            self._create(len(rows[0]))
+        placeholders = ', '.join('?' * self.width)
+        padded = (tuple(row[:self.width]) + ('',) * (self.width - len(row)) for row in rows)
+        with self.conn:
+            self.conn.executemany(f"INSERT INTO rows VALUES ({placeholders});", padded)
+
+    def _sync(self):
+        self.conn.commit()
+        try:
+            return self.conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM rows;").fetchone()[0]
+        except sqlite3.OperationalError:
+            return 0
+
+    def _close(self):
+        self.conn.close()
+
+    @staticmethod
+    def read(path, columns):
+        """Yield the rows of the rows table in the order they were written."""
+        conn = sqlite3.connect(path)
+        try:
+            yield from (list(row) for row in conn.execute("SELECT * FROM rows ORDER BY rowid;"))
+        except sqlite3.OperationalError:  # no rows were ever written
+            pass
+        finally:
+            conn.close()
+
+    @staticmethod
+    def truncate(path, position):
+        conn = sqlite3.connect(path)
+        try:
+            with conn:
+                conn.execute("DELETE FROM rows WHERE rowid > :position", {"position": position})
+        except sqlite3.OperationalError:
+            pass
+        conn.close()
+
+
+sinkTypes = {'csv': CsvSink, 'jsonl': JsonlSink, 'sqlite': SqliteSink}
+
+
+def open_sink(kind, path, columns, batch=500, mode='a', header=True):
+    """Open the sink of the given kind. header is only used by CSV files."""
+    if kind == 'csv':
+        return CsvSink(path, columns, batch, mode, header)
+    return sinkTypes[kind](path, columns, batch, mode)
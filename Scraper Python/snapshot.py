@@ -0,0 +1,109 @@
+"""
+Module contains the snapshot of the previous scrapes of a job, which lets a
+re-scrape skip unchanged webpages and write only the rows that changed.
+"""
+import hashlib
+import json
+import sqlite3
+
+# First column of every row written by a scrape with a snapshot.
+changeColumn = 'change'
+
+
+def digest(data):
+    """Return a signed 64-bit hash of data, the form SQLite stores integers in."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big', signed=True)
+
+
+class Snapshot:
+    """
+    Content hashes of every webpage and row seen by the previous scrapes of a job, kept in a
+    SQLite file.
+
+    Rows are told apart by the cells of their key columns, given as indexes. Without key
+    columns a row is known by its whole content, so a changed row shows up as a delete and
+    an insert. Every scrape is a new run; rows no webpage had during a run are only
+    deleted once it ends, so rows moving between webpages are not deleted on the way.
+    """
+
+    def __init__(self, path, keys=()):
+        self.keys = list(keys)
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, hash INTEGER, run INTEGER);")
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS rows (
+                                 key INTEGER PRIMARY KEY,
+                                 page TEXT,
+                                 hash INTEGER,
+                                 row TEXT,
+                                 run INTEGER
+            );""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS rows_page ON rows (page);")
+        stored = self.conn.execute("SELECT value FROM meta WHERE key = 'run';").fetchone()
+        self.run = stored[0] if stored else 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def begin(self):
+        """Start a new run. A resumed scrape carries on with the run it was interrupted in."""
+        self.run += 1
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('run', ?);", (self.run,))
+
+    def unchanged(self, page, body):
+        """Return whether the webpage has the same content as when it was last scraped."""
+        stored = self.conn.execute("SELECT hash FROM pages WHERE url = ?;", (page,)).fetchone()
+        return stored is not None and stored[0] == digest(body)
+
+    def touch(self, page):
+        """Mark an unchanged webpage and its rows as seen in this run."""
+        self.conn.execute("UPDATE pages SET run = ? WHERE url = ?;", (self.run, page))
+        self.conn.execute("UPDATE rows SET run = ? WHERE page = ?;", (self.run, page))
+
+    def diff(self, page, body, rows):
+        """
+        Store the content of a webpage and return its inserted and updated rows, each
+        preceded by the change, as they are written out.
+        """
+        entries = {}
+        for row in rows:
+            identity = [row[x] for x in self.keys] if self.keys else row
+            entries[digest(json.dumps(identity))] = (row, digest(json.dumps(row)))
+        stored = {}
+        keys = list(entries)
+        for x in range(0, len(keys), 500):
+            chunk = keys[x:x + 500]
+            stored.update(self.conn.execute(f"SELECT key, hash FROM rows WHERE key IN ({','.join('?' * len(chunk))});",
+                                            chunk).fetchall())
+        changes = []
+        for key, (row, row_hash) in entries.items():
+            if key not in stored:
+                changes.append(['insert'] + list(row))
+            elif stored[key] != row_hash:
+                changes.append(['update'] + list(row))
+        self.conn.executemany("INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?);",
+                              [(key, page, row_hash, json.dumps(row), self.run)
+                               for key, (row, row_hash) in entries.items()])
+        self.conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?);", (page, digest(body), self.run))
+        return changes
+
+    def deletes(self):
+        """Remove the rows and webpages not seen in this run and return the deleted rows."""
+        changes = [['delete'] + json.loads(row) for (row,) in
+                   self.conn.execute("SELECT row FROM rows WHERE run < ? ORDER BY page;", (self.run,))]
+        self.conn.execute("DELETE FROM rows WHERE run < ?;", (self.run,))
+        self.conn.execute("DELETE FROM pages WHERE run < ?;", (self.run,))
+        return changes
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
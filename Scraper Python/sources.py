@@ -0,0 +1,84 @@
+"""
+Module contains the streaming page sources of the Scraper, which read the
+webpages to scrape from sitemaps and URL-list files one at a time instead of
+loading them into a list.
+"""
+import contextlib
+import gzip
+import io
+import os
+import xml.etree.ElementTree as ElementTree
+from urllib.parse import urljoin
+
+import requests
+
+
+@contextlib.contextmanager
+def open_stream(location):
+    """
+    Open a file or http(s) URL as a binary stream, read as it downloads. Gzipped content
+    is recognised by its magic bytes and decompressed on the fly.
+    """
+    with contextlib.ExitStack() as stack:
+        if location.startswith(('http://', 'https://')):
+            response = stack.enter_context(requests.get(location, stream=True, timeout=30))
+            response.raise_for_status()
+            response.raw.decode_content = True
+            response.raw.auto_close = False  # lets the buffered reader see the end of the body
+            stream = io.BufferedReader(response.raw)
+        else:
+            stream = stack.enter_context(open(location, 'rb'))
+        if stream.peek(2)[:2] == b'\x1f\x8b':
+            stream = stack.enter_context(gzip.GzipFile(fileobj=stream))
+        yield stream
+
+
+def local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def sitemap_urls(location):
+    """
+    Yield the webpages of a sitemap, following the sitemaps listed by a sitemap index.
+
+    The XML is parsed incrementally and every finished entry is dropped from the tree, so
+    memory stays flat however many webpages the sitemap lists.
+    """
+    children = []
+    with open_stream(location) as stream:
+        root = None
+        loc = None
+        for event, element in ElementTree.iterparse(stream, events=('start', 'end')):
+            if root is None:
+                root = element
+            if event == 'start':
+                continue
+            name = local_name(element.tag)
+            if name == 'loc':
+                loc = (element.text or '').strip()
+            elif name in ['url', 'sitemap'] and loc:
+                if name == 'url':
+                    yield loc
+                else:
+                    children.append(loc)
+                loc = None
+                root.clear()
+    for child in children:
+        if location.startswith(('http://', 'https://')):
+            child = urljoin(location, child)
+        elif not child.startswith(('http://', 'https://')) and not os.path.isabs(child):
+            child = os.path.join(os.path.dirname(location), child)
+        yield from sitemap_urls(child)
+
+
+def listed_urls(location):
+    """Yield the webpages of a URL-list file, one per line. Blank lines and lines starting with # are skipped."""
+    with open_stream(location) as stream:
+        for line in io.TextIOWrapper(stream, encoding='utf-8', errors='replace'):
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+
+# Page source: function yielding its webpages from the feed.
+streamSources = {'sitemap': sitemap_urls, 'urls': listed_urls}
@@ -0,0 +1,95 @@
+"""
+Module contains the per-webpage timing instrumentation of the Scraper and the
+report printed at the end of a scrape.
+"""
+import json
+import math
+import time
+
+stages = ['fetch', 'parse', 'extract', 'write']
+
+
+class Histogram:
+    """
+    Counts durations in buckets growing by a fixed ratio, so percentiles are known within
+    about half that ratio while memory stays bounded however many durations are added.
+    """
+
+    def __init__(self, ratio=1.02, smallest=0.001):
+        self.ratio = ratio
+        self.smallest = smallest
+        self.buckets = {}
+        self.count = 0
+        self.low = math.inf
+        self.high = -math.inf
+
+    def add(self, value):
+        bucket = math.floor(math.log(value / self.smallest, self.ratio)) if value > self.smallest else -1
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.low = min(self.low, value)
+        self.high = max(self.high, value)
+
+    def percentile(self, fraction):
+        """Return the nearest-rank percentile, fraction being between 0 and 1, as the middle of its bucket."""
+        if not self.count:
+            return 0.0
+        rank = min(self.count, max(1, math.ceil(fraction * self.count)))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                break
+        middle = self.smallest * self.ratio ** (bucket + 0.5) if bucket >= 0 else self.smallest
+        return min(self.high, max(self.low, middle))
+
+
+class RunStats:
+    """
+    Collects the fetch, parse, extract and write time of every webpage with its byte,
+    element and row counts. Times go into a Histogram per stage instead of a list, so
+    memory does not grow with the webpages. Each webpage is also written as one line of
+    a JSON Lines log when a log path is given.
+    """
+
+    def __init__(self, log_path=None):
+        self.started = time.perf_counter()
+        self.timings = {stage: Histogram() for stage in stages}
+        self.counters = {"pages": 0, "bytes": 0, "elements": 0, "rows": 0}
+        self.log = open(log_path, 'a', encoding='utf-8') if log_path else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def record(self, page, timings, size, elements, rows):
+        """Record one webpage. timings maps every stage to its duration in ms."""
+        for stage in stages:
+            self.timings[stage].add(timings[stage])
+        self.counters["pages"] += 1
+        self.counters["bytes"] += size
+        self.counters["elements"] += elements
+        self.counters["rows"] += rows
+        if self.log is not None:
+            entry = {"time": time.time(), "page": page, "bytes": size, "elements": elements, "rows": rows}
+            entry.update({f"{stage}_ms": round(timings[stage], 3) for stage in stages})
+            self.log.write(json.dumps(entry) + '\n')
+
+    def summary(self):
+        """Return the totals of the run with the p50 and p95 duration of every stage."""
+        elapsed = time.perf_counter() - self.started
+        summary = dict(self.counters)
+        summary["seconds"] = round(elapsed, 3)
+        summary["pages_per_sec"] = round(self.counters["pages"] / elapsed, 2) if elapsed else 0.0
+        for stage in stages:
+            summary[f"{stage}_p50_ms"] = round(self.timings[stage].percentile(0.5), 3)
+            summary[f"{stage}_p95_ms"] = round(self.timings[stage].percentile(0.95), 3)
+        return summary
+
+    def close(self):
+        if self.log is not None:
+            self.log.write(json.dumps({"time": time.time(), "summary": self.summary()}) + '\n')
+            self.log.close()
+            self.log = None